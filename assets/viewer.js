@@ -0,0 +1,154 @@
+// Tile viewer for fields pre-rendered by `python -m norkyst.site`.
+// Coordinates are grid indices (i east, j north); only the tiles that
+// intersect the view at the current zoom level are fetched.
+(function () {
+  "use strict";
+
+  const DATA = "data/";
+  const canvas = document.getElementById("map");
+  const ctx = canvas.getContext("2d");
+  const variableSelect = document.getElementById("variable");
+  const timeInput = document.getElementById("time");
+  const label = document.getElementById("label");
+  const legend = document.getElementById("legend");
+
+  let site = null;
+  let step = null;                       // per-time-step index of the current field
+  const view = { i: 0, j: 0, scale: 1 }; // grid point at the canvas centre, pixels per cell
+  const tiles = new Map();               // url -> ImageBitmap | Promise | null
+  const steps = new Map();               // url -> per-time-step index promise
+
+  function fetchOk(url) {
+    return fetch(url).then((r) => {
+      if (!r.ok) throw new Error(url + ": " + r.status);
+      return r;
+    });
+  }
+
+  function fetchJSON(url) {
+    return fetchOk(url).then((r) => r.json());
+  }
+
+  function stepUrl() {
+    return DATA + variableSelect.value + "/" + timeInput.value + "/";
+  }
+
+  function loadStep() {
+    const url = stepUrl();
+    if (!steps.has(url)) steps.set(url, fetchJSON(url + "index.json"));
+    label.textContent = site.times[timeInput.value];
+    steps.get(url).then((index) => {
+      if (url !== stepUrl()) return;
+      step = Object.assign({ url: url }, index);
+      // One colour range per variable, shared by all time steps.
+      const meta = site.variables[variableSelect.value] || {};
+      const units = meta.units ? " " + meta.units : "";
+      legend.textContent = meta.vmin == null ? "no data"
+        : meta.vmin.toFixed(2) + " – " + meta.vmax.toFixed(2) + units;
+      draw();
+    }).catch((error) => {
+      steps.delete(url); // allow a retry when this step is selected again
+      if (url !== stepUrl()) return;
+      step = null;
+      legend.textContent = "failed to load";
+      console.error(error);
+      draw();
+    });
+  }
+
+  function loadTile(url) {
+    // Tiles are north-up indexed PNGs, coloured by their own palette.
+    const promise = fetchOk(url)
+      .then((r) => r.blob())
+      .then((blob) => createImageBitmap(blob))
+      .then((bitmap) => {
+        tiles.set(url, bitmap);
+        draw();
+      })
+      .catch((error) => {
+        tiles.set(url, null);
+        console.error(error);
+      });
+    tiles.set(url, promise);
+  }
+
+  function zoomLevel() {
+    // Coarsest level that still has at least one cell per screen pixel.
+    const zooms = site.grid.zooms;
+    for (let z = 0; z < zooms.length; z++) {
+      if (view.scale * zooms[z].factor <= 1.5) return z;
+    }
+    return zooms.length - 1;
+  }
+
+  function draw() {
+    const w = canvas.width, h = canvas.height;
+    ctx.clearRect(0, 0, w, h);
+    if (!step || step.tiles.length === 0) return;
+    ctx.imageSmoothingEnabled = false;
+    const z = zoomLevel();
+    const { factor, shape } = site.grid.zooms[z];
+    const size = site.tile_size;
+    const cell = factor * view.scale; // pixels per cell at this zoom level
+    const i0 = view.i - w / 2 / view.scale;
+    const j0 = view.j - h / 2 / view.scale;
+    for (const [ty, tx] of step.tiles[z]) {
+      // Edge tiles are cut to the level's shape.
+      const rows = Math.min(size, shape[0] - ty * size);
+      const cols = Math.min(size, shape[1] - tx * size);
+      const x = (tx * size * factor - i0) * view.scale;
+      const y = h - ((ty * size + rows) * factor - j0) * view.scale;
+      if (x > w || y > h || x + cols * cell < 0 || y + rows * cell < 0) continue;
+      const url = step.url + z + "/" + ty + "_" + tx + ".png";
+      const tile = tiles.get(url);
+      if (tile === undefined) loadTile(url);
+      else if (tile instanceof ImageBitmap) ctx.drawImage(tile, x, y, cols * cell, rows * cell);
+    }
+  }
+
+  function resize() {
+    canvas.width = canvas.clientWidth * devicePixelRatio;
+    canvas.height = canvas.clientHeight * devicePixelRatio;
+    draw();
+  }
+
+  function fit() {
+    const [ny, nx] = site.grid.shape;
+    view.i = nx / 2;
+    view.j = ny / 2;
+    view.scale = Math.min(canvas.width / nx, canvas.height / ny);
+  }
+
+  let drag = null;
+  canvas.addEventListener("mousedown", (e) => { drag = { x: e.clientX, y: e.clientY }; });
+  window.addEventListener("mouseup", () => { drag = null; });
+  window.addEventListener("mousemove", (e) => {
+    if (!drag) return;
+    view.i -= (e.clientX - drag.x) * devicePixelRatio / view.scale;
+    view.j += (e.clientY - drag.y) * devicePixelRatio / view.scale;
+    drag = { x: e.clientX, y: e.clientY };
+    draw();
+  });
+  canvas.addEventListener("wheel", (e) => {
+    e.preventDefault();
+    view.scale *= Math.exp(-e.deltaY * 0.002);
+    draw();
+  }, { passive: false });
+  variableSelect.addEventListener("change", loadStep);
+  timeInput.addEventListener("input", loadStep);
+  window.addEventListener("resize", resize);
+
+  fetchJSON(DATA + "index.json").then((index) => {
+    site = index;
+    for (const name of Object.keys(site.variables)) {
+      variableSelect.add(new Option(site.variables[name].long_name || name, name));
+    }
+    timeInput.max = site.times.length - 1;
+    resize();
+    fit();
+    loadStep();
+  }).catch((error) => {
+    legend.textContent = "no site data found";
+    console.error(error);
+  });
+})();
@@ -0,0 +1,318 @@
+"""Benchmarks for the reader and point extraction.
+
+Generates a synthetic ROMS-style file of the requested size, times the
+open, slice, locate and interpolate paths and writes one JSON object per
+benchmark to ``bench_output.txt``::
+
+    python benchmarks/bench.py --ny 400 --nx 600 --nt 24 --points 2000
+    python benchmarks/bench.py --compare previous_bench.txt
+
+Each record holds the best and median wall time over ``--repeat`` runs
+and two memory figures, each from one further run:
+
+``peak_traced_mib``
+    Peak Python/NumPy allocation, traced with :mod:`tracemalloc` (which is
+    off while timing).  It misses memory allocated by the HDF5/netCDF C
+    libraries and pages of memory-mapped files.
+``rss_growth_mib``
+    How far the peak resident set size rose above the resident set size
+    at the start of the run.  This covers C buffers and mapped pages too.
+    It needs Linux, where the peak can be reset before each run; elsewhere
+    it is null.
+
+With ``--compare`` the run exits non-zero when a benchmark got slower
+than the threshold allows.  Runs with a different size, format, worker
+count or backend are not compared.
+"""
+
+from __future__ import annotations
+
+import argparse
+import ctypes
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import norkyst  # noqa: E402
+from norkyst import extract  # noqa: E402
+from norkyst._interp import HAVE_EXTENSION, bilinear  # noqa: E402
+from norkyst.testing import grid_position, write_synthetic_roms  # noqa: E402
+
+DEPTHS = [0.0, 5.0, 10.0, 25.0, 50.0, 100.0, 200.0]
+# Context fields that must match for timings to be comparable.
+COMPARABLE = ("ny", "nx", "nt", "nz", "points", "chunk", "format", "workers", "extension")
+DEFAULT_OUTPUT = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "bench_output.txt"
+)
+
+
+def _rss_mib() -> Dict[str, float]:
+    """Current (``VmRSS``) and peak (``VmHWM``) resident set size, Linux only."""
+    sizes = {}
+    try:
+        with open("/proc/self/status") as fh:
+            for line in fh:
+                key, _, value = line.partition(":")
+                if key in ("VmRSS", "VmHWM"):
+                    sizes[key] = int(value.split()[0]) / 2**10
+    except OSError:
+        pass
+    return sizes
+
+
+def _reset_peak_rss() -> bool:
+    """Reset the peak resident set size to the current one (Linux >= 4.0).
+
+    Freed heap memory is first handed back to the system where glibc
+    allows, so that reusing it counts as growth again.
+    """
+    try:
+        ctypes.CDLL("libc.so.6").malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+    try:
+        with open("/proc/self/clear_refs", "w") as fh:
+            fh.write("5")
+    except OSError:
+        return False
+    return True
+
+
+def measure(func: Callable[[], object], repeat: int, setup: Optional[Callable[[], None]] = None):
+    """Run ``func`` ``repeat`` times; return wall times, peak traced bytes
+    and the growth of the peak resident set size in MiB (or None).
+
+    The timed runs are untraced, since tracemalloc hooks every allocation;
+    the memory figures come from two extra runs.
+    """
+    times: List[float] = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    if setup is not None:
+        setup()
+    growth = None
+    if _reset_peak_rss():
+        before = _rss_mib()
+        func()
+        after = _rss_mib()
+        if "VmRSS" in before and "VmHWM" in after:
+            growth = after["VmHWM"] - before["VmRSS"]
+    if setup is not None:
+        setup()
+    tracemalloc.start()
+    try:
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return times, peak, growth
+
+
+def run(args: argparse.Namespace, workdir: str) -> List[Dict[str, object]]:
+    path = os.path.join(workdir, "synthetic.nc")
+    write_synthetic_roms(path, ny=args.ny, nx=args.nx, nt=args.nt, nz=args.nz, format=args.format)
+    cache_dir = os.path.join(workdir, "cache")
+
+    rng = np.random.default_rng(args.seed)
+    lon, lat = grid_position(
+        rng.uniform(0, args.ny - 1, args.points), rng.uniform(0, args.nx - 1, args.points)
+    )
+
+    ds = norkyst.open_dataset(path)
+    temp = ds["temp"]
+    lon_rho, lat_rho = ds["lon_rho"].read(), ds["lat_rho"].read()
+    mask = ds["mask_rho"].read()
+
+    def open_close():
+        norkyst.open_dataset(path).close()
+
+    def clear_locators():
+        extract._locators.clear()
+        for name in os.listdir(cache_dir) if os.path.isdir(cache_dir) else ():
+            os.remove(os.path.join(cache_dir, name))
+
+    def get_locator():
+        extract.GridLocator.cached(lon_rho, lat_rho, cache_dir=cache_dir)
+
+    locator = extract.GridLocator.cached(lon_rho, lat_rho, cache_dir=cache_dir)
+    index = locator.locate(lon, lat, mask)
+    surface = temp[0, -1]
+
+    cases = [
+        ("open", open_close, None, 1),
+        ("slice_surface", lambda: temp[0, -1], None, args.ny * args.nx),
+        ("slice_column_block", lambda: temp[:, :, :16, :16], None, args.nt * args.nz * 256),
+        ("slice_full_step", lambda: temp[0], None, args.nz * args.ny * args.nx),
+        ("locator_build", get_locator, clear_locators, args.ny * args.nx),
+        ("locator_load_cached", get_locator, lambda: extract._locators.clear(), args.ny * args.nx),
+        ("locate_points", lambda: locator.locate(lon, lat, mask), None, args.points),
+        (
+            "interpolate_surface",
+            lambda: bilinear(surface, index.j, index.i, index.weights, workers=args.workers),
+            None,
+            args.points,
+        ),
+        (
+            "stream_points",
+            lambda: [
+                c
+                for c in norkyst.PointExtractor(ds, lon, lat, cache_dir=cache_dir).stream(
+                    "temp", chunk_size=args.chunk, workers=args.workers
+                )
+            ],
+            None,
+            args.points * args.nt * args.nz,
+        ),
+        (
+            "stream_points_depths",
+            lambda: [
+                c
+                for c in norkyst.PointExtractor(ds, lon, lat, cache_dir=cache_dir).stream(
+                    "temp", chunk_size=args.chunk, depths=DEPTHS, workers=args.workers
+                )
+            ],
+            None,
+            args.points * args.nt * len(DEPTHS),
+        ),
+    ]
+
+    results = []
+    for name, func, setup, items in cases:
+        if args.only and name not in args.only:
+            continue
+        func()  # warm up caches and lazy imports
+        times, peak, growth = measure(func, args.repeat, setup)
+        best = min(times)
+        results.append(
+            {
+                "benchmark": name,
+                "best_s": best,
+                "median_s": statistics.median(times),
+                "repeat": args.repeat,
+                "items": items,
+                "items_per_s": items / best if best > 0 else None,
+                "peak_traced_mib": peak / 2**20,
+                "rss_growth_mib": growth,
+            }
+        )
+        print(
+            f"{name:24s} best {best * 1e3:10.3f} ms  peak {peak / 2**20:8.2f} MiB"
+            + ("" if growth is None else f"  rss +{growth:.2f} MiB"),
+            file=sys.stderr,
+        )
+    ds.close()
+    return results
+
+
+def compare(
+    results: List[Dict[str, object]],
+    context: Dict[str, object],
+    previous_path: str,
+    threshold: float,
+) -> List[str]:
+    """Describe the benchmarks whose best time grew by more than ``threshold``.
+
+    Raises :class:`ValueError` if the previous run differs from ``context``
+    in any :data:`COMPARABLE` field.
+    """
+    previous = {}
+    with open(previous_path) as fh:
+        for line in fh:
+            record = json.loads(line)
+            if "benchmark" in record:
+                previous[record["benchmark"]] = record
+    for old in previous.values():
+        differ = [
+            f"{key} {old.get(key)!r} != {context[key]!r}"
+            for key in COMPARABLE
+            if old.get(key) != context[key]
+        ]
+        if differ:
+            raise ValueError(f"{previous_path} was run with " + ", ".join(differ))
+    slower = []
+    for record in results:
+        old = previous.get(record["benchmark"])
+        if old is not None and record["best_s"] > old["best_s"] * (1 + threshold):
+            slower.append(
+                f"{record['benchmark']}: {old['best_s'] * 1e3:.3f} ms -> {record['best_s'] * 1e3:.3f} ms"
+            )
+    return slower
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--ny", type=int, default=200, help="eta_rho size")
+    parser.add_argument("--nx", type=int, default=300, help="xi_rho size")
+    parser.add_argument("--nt", type=int, default=24, help="number of time steps")
+    parser.add_argument("--nz", type=int, default=8, help="number of s_rho levels")
+    parser.add_argument("--points", type=int, default=1000, help="number of extraction points")
+    parser.add_argument("--chunk", type=int, default=6, help="time steps per streamed chunk")
+    parser.add_argument("--workers", type=int, default=1, help="threads for interpolation")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--format", default="NETCDF4", help="netCDF4 file format, e.g. NETCDF3_64BIT_OFFSET"
+    )
+    parser.add_argument("--only", nargs="*", help="run only these benchmarks")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    parser.add_argument("--compare", metavar="PREVIOUS", help="earlier bench_output.txt to compare with")
+    parser.add_argument(
+        "--threshold", type=float, default=0.2, help="allowed relative slowdown for --compare"
+    )
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="norkyst-bench-") as workdir:
+        results = run(args, workdir)
+
+    context = {
+        "run": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "norkyst": norkyst.__version__,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "extension": HAVE_EXTENSION,
+        "workers": args.workers,
+        "ny": args.ny,
+        "nx": args.nx,
+        "nt": args.nt,
+        "nz": args.nz,
+        "points": args.points,
+        "chunk": args.chunk,
+        "format": args.format,
+    }
+    # Read the baseline before writing, in case it is the output file itself.
+    slower: List[str] = []
+    mismatch = None
+    if args.compare:
+        try:
+            slower = compare(results, context, args.compare, args.threshold)
+        except ValueError as exc:
+            mismatch = str(exc)
+    with open(args.output, "w") as fh:
+        for record in results:
+            fh.write(json.dumps({**context, **record}) + "\n")
+
+    if mismatch is not None:
+        print(f"not compared: {mismatch}", file=sys.stderr)
+        return 2
+    for line in slower:
+        print(f"REGRESSION {line}", file=sys.stderr)
+    return 1 if slower else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,17 @@
+"""Readers and tools for NorKyst-800 coastal ocean model output."""
+
+from norkyst.extract import Chunk, GridLocator, PointExtractor, PointIndex
+from norkyst.reader import NorKystDataset, Variable, decode_time, open_dataset
+
+__all__ = [
+    "Chunk",
+    "GridLocator",
+    "NorKystDataset",
+    "PointExtractor",
+    "PointIndex",
+    "Variable",
+    "decode_time",
+    "open_dataset",
+]
+
+__version__ = "0.1.0"
@@ -0,0 +1,205 @@
+"""Interpolation kernels shared by the extraction code.
+
+Each kernel has a NumPy implementation and, when the optional
+``norkyst_ext`` extension (built from ``rust/``) is installed, a compiled
+one.  Both accumulate in float64 in the same order, so they are meant to
+return identical results (``tests/test_interp.py`` checks this when the
+extension is installed).  The compiled kernels release the GIL, so
+``workers > 1`` splits the points over a thread pool that can run on
+several cores; the NumPy kernels accept ``workers`` too but gain less, as
+only part of their time is spent outside the GIL.
+"""
+
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+import numpy as np
+
+try:
+    import norkyst_ext as _ext
+except ImportError:
+    _ext = None
+
+__all__ = ["HAVE_EXTENSION", "bilinear", "sigma_z", "vertical"]
+
+HAVE_EXTENSION = _ext is not None
+
+
+def _use_extension(backend: str) -> bool:
+    if backend == "auto":
+        return HAVE_EXTENSION
+    if backend == "ext":
+        if not HAVE_EXTENSION:
+            raise ImportError("the norkyst_ext extension is not installed")
+        return True
+    if backend == "numpy":
+        return False
+    raise ValueError(f"unknown backend {backend!r}")
+
+
+def _split_points(
+    kernel: Callable[[slice], np.ndarray], npoints: int, workers: Optional[int]
+) -> np.ndarray:
+    """Run ``kernel`` over blocks of points, in parallel if ``workers > 1``."""
+    workers = max(1, min(workers or 1, npoints))
+    if workers == 1:
+        return kernel(slice(None))
+    bounds = np.linspace(0, npoints, workers + 1).astype(int)
+    blocks = [slice(a, b) for a, b in zip(bounds[:-1], bounds[1:])]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        parts = list(pool.map(kernel, blocks))
+    return np.concatenate(parts, axis=-1)
+
+
+def _bilinear_numpy(
+    field: np.ndarray, j: np.ndarray, i: np.ndarray, weights: np.ndarray
+) -> np.ndarray:
+    corners = (
+        field[..., j, i],
+        field[..., j, i + 1],
+        field[..., j + 1, i],
+        field[..., j + 1, i + 1],
+    )
+    num = np.zeros(corners[0].shape, dtype=np.float64)
+    den = np.zeros_like(num)
+    for k, value in enumerate(corners):
+        w = weights[:, k]
+        valid = ~np.isnan(value) & (w > 0)
+        num += np.where(valid, value * w, 0.0)
+        den += np.where(valid, w, 0.0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(den > 0, num / den, np.nan)
+
+
+def _bilinear_ext(
+    field: np.ndarray, j: np.ndarray, i: np.ndarray, weights: np.ndarray
+) -> np.ndarray:
+    lead = field.shape[:-2]
+    flat = field.reshape((-1,) + field.shape[-2:])
+    if flat.dtype == np.float32:
+        func = _ext.bilinear_f32
+    else:
+        func = _ext.bilinear_f64
+        flat = flat.astype(np.float64, copy=False)
+    out = func(
+        np.ascontiguousarray(flat),
+        np.ascontiguousarray(j, dtype=np.int64),
+        np.ascontiguousarray(i, dtype=np.int64),
+        np.ascontiguousarray(weights, dtype=np.float64),
+    )
+    return out.reshape(lead + (len(j),))
+
+
+def bilinear(
+    field: np.ndarray,
+    j: np.ndarray,
+    i: np.ndarray,
+    weights: np.ndarray,
+    workers: Optional[int] = None,
+    backend: str = "auto",
+) -> np.ndarray:
+    """Interpolate ``field`` at points inside grid cells.
+
+    ``field`` has shape ``(..., ny, nx)``.  Each point lies in the cell whose
+    lower-left corner is ``(j, i)``; ``weights`` has shape ``(npoints, 4)``
+    and holds the weights of the corners ``(j, i)``, ``(j, i + 1)``,
+    ``(j + 1, i)`` and ``(j + 1, i + 1)``.  Corners that are NaN in
+    ``field`` are dropped and the remaining weights renormalised, so points
+    next to land still get a value.  Returns an array of shape
+    ``(..., npoints)``; points with no valid corner are NaN.
+
+    ``backend`` is ``"auto"``, ``"ext"`` or ``"numpy"``; ``workers`` is the
+    number of threads the points are split over.
+    """
+    out_dtype = np.result_type(field.dtype, np.float32)
+    impl = _bilinear_ext if _use_extension(backend) else _bilinear_numpy
+    out = _split_points(
+        lambda s: impl(field, j[s], i[s], weights[s]), len(j), workers
+    )
+    return out.astype(out_dtype, copy=False)
+
+
+def sigma_z(
+    h: np.ndarray,
+    zeta: np.ndarray,
+    s_rho: np.ndarray,
+    cs_r: np.ndarray,
+    hc: float,
+    vtransform: int = 2,
+) -> np.ndarray:
+    """Heights of ROMS s-levels relative to the mean surface.
+
+    ``h`` has shape ``(npoints,)`` and ``zeta`` shape ``(..., npoints)``;
+    the result has shape ``(..., nz, npoints)`` with the bottom level first.
+    ``vtransform`` defaults to 2, the transform NorKyst-800 uses.
+    """
+    h = np.asarray(h, dtype=np.float64)
+    zeta = np.asarray(zeta, dtype=np.float64)[..., None, :]
+    s = np.asarray(s_rho, dtype=np.float64)[:, None]
+    c = np.asarray(cs_r, dtype=np.float64)[:, None]
+    if vtransform == 1:
+        z0 = hc * s + (h - hc) * c
+        return z0 + zeta * (1.0 + z0 / h)
+    if vtransform == 2:
+        z0 = (hc * s + h * c) / (hc + h)
+        return zeta + (zeta + h) * z0
+    raise ValueError(f"unsupported Vtransform {vtransform!r}")
+
+
+def _vertical_numpy(values: np.ndarray, z: np.ndarray, targets: np.ndarray) -> np.ndarray:
+    nz = values.shape[-2]
+    out = np.empty(values.shape[:-2] + (len(targets),) + values.shape[-1:])
+    top_z, top_v = z[..., -1, :], values[..., -1, :]
+    for d, zt in enumerate(targets):
+        if nz > 1:
+            k = np.clip(np.sum(z <= zt, axis=-2) - 1, 0, nz - 2)[..., None, :]
+            z0 = np.take_along_axis(z, k, axis=-2)[..., 0, :]
+            z1 = np.take_along_axis(z, k + 1, axis=-2)[..., 0, :]
+            v0 = np.take_along_axis(values, k, axis=-2)[..., 0, :]
+            v1 = np.take_along_axis(values, k + 1, axis=-2)[..., 0, :]
+            with np.errstate(invalid="ignore", divide="ignore"):
+                frac = (zt - z0) / (z1 - z0)
+                inner = np.where((z0 <= zt) & (zt < z1), v0 + frac * (v1 - v0), np.nan)
+        else:
+            inner = np.full(top_v.shape, np.nan)
+        out[..., d, :] = np.where(zt >= top_z, top_v, inner)
+    return out
+
+
+def _vertical_ext(values: np.ndarray, z: np.ndarray, targets: np.ndarray) -> np.ndarray:
+    nz, n = values.shape[-2:]
+    out = _ext.vertical(
+        np.ascontiguousarray(values.reshape(-1, nz, n)),
+        np.ascontiguousarray(z.reshape(-1, nz, n)),
+        np.ascontiguousarray(targets),
+    )
+    return out.reshape(values.shape[:-2] + (len(targets), n))
+
+
+def vertical(
+    values: np.ndarray,
+    z: np.ndarray,
+    depths: np.ndarray,
+    workers: Optional[int] = None,
+    backend: str = "auto",
+) -> np.ndarray:
+    """Interpolate s-level columns linearly to depths below the mean surface.
+
+    ``values`` and ``z`` have shape ``(..., nz, npoints)`` with ``z`` from
+    :func:`sigma_z`; ``depths`` are positive downwards.  Depths above the
+    top s-level take the top value and depths below the bottom s-level are
+    NaN.  Returns an array of shape ``(..., ndepths, npoints)``.
+    """
+    if values.shape != z.shape:
+        raise ValueError("values and z must have the same shape")
+    out_dtype = np.result_type(values.dtype, np.float32)
+    values = np.asarray(values, dtype=np.float64)
+    z = np.asarray(z, dtype=np.float64)
+    targets = -np.atleast_1d(np.asarray(depths, dtype=np.float64))
+    impl = _vertical_ext if _use_extension(backend) else _vertical_numpy
+    out = _split_points(
+        lambda s: impl(values[..., s], z[..., s], targets), values.shape[-1], workers
+    )
+    return out.astype(out_dtype, copy=False)
@@ -0,0 +1,504 @@
+"""Streaming time-series extraction at point locations.
+
+Points are located on the curvilinear model grid with a KD-tree built over
+the grid nodes.  The tree is built once per grid, kept in memory for the
+life of the process and pickled to an on-disk cache keyed by a hash of the
+coordinates, so later processes reading files on the same grid skip the
+build.  Values are then read one block of time steps at a time and
+interpolated bilinearly, so memory use is bounded by the block size rather
+than by the length of the file.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import pickle
+import tempfile
+from dataclasses import dataclass
+from typing import Dict, Iterator, NamedTuple, Optional, Tuple, Union
+
+import numpy as np
+
+from norkyst._interp import bilinear, sigma_z, vertical
+from norkyst.reader import NorKystDataset, Variable
+
+__all__ = [
+    "Chunk",
+    "GridLocator",
+    "PointExtractor",
+    "PointIndex",
+    "default_cache_dir",
+    "grid_variables",
+    "section_points",
+]
+
+_CACHE_VERSION = 1
+_NEWTON_STEPS = 8
+_CELL_TOLERANCE = 1e-6
+_EARTH_RADIUS = 6371000.0
+
+_locators: Dict[str, "GridLocator"] = {}
+
+
+def default_cache_dir() -> str:
+    """Directory for cached grid trees: ``$NORKYST_CACHE`` or ``~/.cache/norkyst``."""
+    path = os.environ.get("NORKYST_CACHE")
+    if path:
+        return path
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "norkyst")
+
+
+def _to_xyz(lon: np.ndarray, lat: np.ndarray) -> np.ndarray:
+    lon = np.radians(np.asarray(lon, dtype=np.float64))
+    lat = np.radians(np.asarray(lat, dtype=np.float64))
+    cos_lat = np.cos(lat)
+    return np.stack([cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)], axis=-1)
+
+
+def _build_tree(lon: np.ndarray, lat: np.ndarray):
+    from scipy.spatial import cKDTree
+
+    return cKDTree(_to_xyz(lon, lat).reshape(-1, 3))
+
+
+def _tree_format() -> Tuple[int, str, str]:
+    """What a pickled tree depends on besides the grid, for the cache key."""
+    import scipy
+    from scipy.spatial import cKDTree
+
+    return _CACHE_VERSION, f"{cKDTree.__module__}.{cKDTree.__qualname__}", scipy.__version__
+
+
+def _is_tree(tree: object, size: int) -> bool:
+    from scipy.spatial import cKDTree
+
+    return isinstance(tree, cKDTree) and tree.n == size and tree.m == 3
+
+
+def section_points(
+    lon: np.ndarray, lat: np.ndarray, spacing: float
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Points along a polyline of waypoints, about ``spacing`` metres apart.
+
+    Each leg is split into equal steps no longer than ``spacing`` (measured
+    along the great circle) and interpolated linearly in longitude and
+    latitude; every waypoint is kept.  Pass the result to
+    :class:`PointExtractor` to extract a section.
+    """
+    lon = np.atleast_1d(np.asarray(lon, dtype=np.float64))
+    lat = np.atleast_1d(np.asarray(lat, dtype=np.float64))
+    if lon.shape != lat.shape or lon.ndim != 1 or len(lon) < 2:
+        raise ValueError("need at least two waypoints with matching lon and lat")
+    if spacing <= 0:
+        raise ValueError("spacing must be positive")
+    xyz = _to_xyz(lon, lat)
+    chord = np.linalg.norm(np.diff(xyz, axis=0), axis=1)
+    length = 2 * _EARTH_RADIUS * np.arcsin(np.clip(chord / 2, 0.0, 1.0))
+    out_lon, out_lat = [lon[:1]], [lat[:1]]
+    for k, leg in enumerate(length):
+        frac = np.linspace(0.0, 1.0, max(1, int(np.ceil(leg / spacing))) + 1)[1:]
+        out_lon.append(lon[k] + frac * (lon[k + 1] - lon[k]))
+        out_lat.append(lat[k] + frac * (lat[k + 1] - lat[k]))
+    return np.concatenate(out_lon), np.concatenate(out_lat)
+
+
+@dataclass(frozen=True)
+class PointIndex:
+    """Cell indices and bilinear weights of a set of points on one grid.
+
+    ``j``/``i`` are the lower-left corners of the cells holding each point
+    and ``weights`` the ``(npoints, 4)`` corner weights in the order used by
+    the interpolation kernel.  ``inside`` is False for points that fall
+    outside the grid or in a fully masked cell; their weights are zero.
+    """
+
+    j: np.ndarray
+    i: np.ndarray
+    weights: np.ndarray
+    inside: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.j)
+
+    def window(self) -> Tuple[slice, slice]:
+        """The smallest ``(eta, xi)`` window holding every used cell."""
+        if not self.inside.any():
+            return slice(0, 0), slice(0, 0)
+        j = self.j[self.inside]
+        i = self.i[self.inside]
+        return slice(int(j.min()), int(j.max()) + 2), slice(int(i.min()), int(i.max()) + 2)
+
+    def window_cells(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Cell corners relative to :meth:`window`.
+
+        Points outside the window (off the grid or on land) are mapped to
+        the window origin; their weights are zero, so they still
+        interpolate to NaN.
+        """
+        ywin, xwin = self.window()
+        j = np.where(self.inside, self.j - ywin.start, 0)
+        i = np.where(self.inside, self.i - xwin.start, 0)
+        return j, i
+
+
+class GridLocator:
+    """Locates points on a curvilinear grid given its 2-D node coordinates."""
+
+    def __init__(self, lon: np.ndarray, lat: np.ndarray, tree=None) -> None:
+        lon = np.asarray(lon, dtype=np.float64)
+        lat = np.asarray(lat, dtype=np.float64)
+        if lon.ndim != 2 or lon.shape != lat.shape:
+            raise ValueError("lon and lat must be 2-D arrays of the same shape")
+        if min(lon.shape) < 2:
+            raise ValueError("the grid must have at least 2 x 2 nodes")
+        self.lon = lon
+        self.lat = lat
+        if tree is None:
+            tree = _build_tree(lon, lat)
+        self.tree = tree
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return self.lon.shape
+
+    @staticmethod
+    def digest(lon: np.ndarray, lat: np.ndarray) -> str:
+        """Cache key for a grid: a hash of its shape and coordinates.
+
+        The key also covers the cache version, the tree class and the scipy
+        version, so a scipy upgrade starts a fresh cache.
+        """
+        h = hashlib.sha1()
+        h.update(repr((_tree_format(), lon.shape)).encode())
+        h.update(np.ascontiguousarray(lon, dtype=np.float64).tobytes())
+        h.update(np.ascontiguousarray(lat, dtype=np.float64).tobytes())
+        return h.hexdigest()
+
+    @classmethod
+    def cached(
+        cls, lon: np.ndarray, lat: np.ndarray, cache_dir: Optional[str] = None
+    ) -> "GridLocator":
+        """Return the locator for this grid, building and caching it if needed.
+
+        Locators are shared within a process and their trees are pickled to
+        ``cache_dir`` (see :func:`default_cache_dir`).  Pass
+        ``cache_dir=""`` to keep the tree in memory only.  A cache file
+        that cannot be loaded or does not hold a tree for this grid is
+        rebuilt and overwritten.
+        """
+        lon = np.asarray(lon, dtype=np.float64)
+        lat = np.asarray(lat, dtype=np.float64)
+        key = cls.digest(lon, lat)
+        locator = _locators.get(key)
+        if locator is not None:
+            return locator
+        if cache_dir is None:
+            cache_dir = default_cache_dir()
+        path = os.path.join(cache_dir, f"grid-{key}.pickle") if cache_dir else None
+        tree = None
+        if path and os.path.exists(path):
+            try:
+                with open(path, "rb") as fh:
+                    tree = pickle.load(fh)
+            except Exception:
+                # Truncated files, but also pickles of classes that have
+                # since moved or gone (ModuleNotFoundError, AttributeError).
+                tree = None
+            if not _is_tree(tree, lon.size):
+                tree = None
+        locator = cls(lon, lat, tree=tree)
+        if path and tree is None:
+            try:
+                os.makedirs(cache_dir, exist_ok=True)
+                fd, tmp = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+                with os.fdopen(fd, "wb") as fh:
+                    pickle.dump(locator.tree, fh, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(tmp, path)
+            except OSError:
+                pass
+        _locators[key] = locator
+        return locator
+
+    def locate(
+        self, lon: np.ndarray, lat: np.ndarray, mask: Optional[np.ndarray] = None
+    ) -> PointIndex:
+        """Find the cell and bilinear weights of each point.
+
+        ``mask`` is an optional grid-shaped array that is zero on land;
+        masked corners get zero weight.
+        """
+        lon = np.atleast_1d(np.asarray(lon, dtype=np.float64))
+        lat = np.atleast_1d(np.asarray(lat, dtype=np.float64))
+        if lon.shape != lat.shape or lon.ndim != 1:
+            raise ValueError("point lon and lat must be 1-D arrays of the same length")
+        ny, nx = self.shape
+        _, nearest = self.tree.query(_to_xyz(lon, lat))
+        jn, in_ = np.unravel_index(nearest, self.shape)
+
+        n = len(lon)
+        j = np.zeros(n, dtype=np.intp)
+        i = np.zeros(n, dtype=np.intp)
+        s = np.zeros(n)
+        t = np.zeros(n)
+        found = np.zeros(n, dtype=bool)
+        # The point lies in one of the four cells sharing its nearest node.
+        for dj in (0, -1):
+            for di in (0, -1):
+                todo = ~found
+                if not todo.any():
+                    break
+                cj = np.clip(jn[todo] + dj, 0, ny - 2)
+                ci = np.clip(in_[todo] + di, 0, nx - 2)
+                cs, ct = self._invert_cell(cj, ci, lon[todo], lat[todo])
+                ok = (
+                    (cs >= -_CELL_TOLERANCE)
+                    & (cs <= 1 + _CELL_TOLERANCE)
+                    & (ct >= -_CELL_TOLERANCE)
+                    & (ct <= 1 + _CELL_TOLERANCE)
+                )
+                idx = np.flatnonzero(todo)[ok]
+                j[idx], i[idx] = cj[ok], ci[ok]
+                s[idx] = np.clip(cs[ok], 0.0, 1.0)
+                t[idx] = np.clip(ct[ok], 0.0, 1.0)
+                found[idx] = True
+
+        weights = np.stack([(1 - t) * (1 - s), (1 - t) * s, t * (1 - s), t * s], axis=1)
+        weights[~found] = 0.0
+        if mask is not None:
+            wet = np.asarray(mask) > 0
+            weights *= np.stack(
+                [wet[j, i], wet[j, i + 1], wet[j + 1, i], wet[j + 1, i + 1]], axis=1
+            )
+        inside = weights.sum(axis=1) > 0
+        return PointIndex(j=j, i=i, weights=weights, inside=inside)
+
+    def _invert_cell(
+        self, j: np.ndarray, i: np.ndarray, lon: np.ndarray, lat: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        # Work in a local equirectangular plane centred on each point, and
+        # solve P(s, t) = 0 for the bilinear cell map with Newton's method.
+        scale = np.cos(np.radians(lat))
+
+        def corner(dj: int, di: int) -> np.ndarray:
+            x = (self.lon[j + dj, i + di] - lon + 180.0) % 360.0 - 180.0
+            return np.stack([x * scale, self.lat[j + dj, i + di] - lat])
+
+        p00, p01, p10, p11 = corner(0, 0), corner(0, 1), corner(1, 0), corner(1, 1)
+        s = np.full(len(j), 0.5)
+        t = np.full(len(j), 0.5)
+        for _ in range(_NEWTON_STEPS):
+            f = (1 - s) * (1 - t) * p00 + s * (1 - t) * p01 + (1 - s) * t * p10 + s * t * p11
+            ds = (1 - t) * (p01 - p00) + t * (p11 - p10)
+            dt = (1 - s) * (p10 - p00) + s * (p11 - p01)
+            det = ds[0] * dt[1] - ds[1] * dt[0]
+            det = np.where(det == 0, np.nan, det)
+            s = s - (f[0] * dt[1] - f[1] * dt[0]) / det
+            t = t - (ds[0] * f[1] - ds[1] * f[0]) / det
+        return np.nan_to_num(s, nan=-1.0), np.nan_to_num(t, nan=-1.0)
+
+
+class Chunk(NamedTuple):
+    """One block of extracted values.
+
+    ``values`` has shape ``(ntime, ..., npoints)``, where ``...`` are any
+    dimensions between time and the horizontal grid (e.g. depth).
+    """
+
+    start: int
+    time: Optional[np.ndarray]
+    values: np.ndarray
+
+
+def _is_coordinate(var: Variable, kind: str) -> bool:
+    name = var.name.lower()
+    short = {"longitude": "lon", "latitude": "lat"}[kind]
+    return (
+        var.attrs.get("standard_name") == kind
+        or name in (short, kind)
+        or name.startswith(short + "_")
+    )
+
+
+def grid_variables(
+    dataset: NorKystDataset, dims: Tuple[str, str]
+) -> Tuple[Variable, Variable, Optional[Variable]]:
+    """Longitude, latitude and (if present) land mask of a horizontal grid.
+
+    ``dims`` are the grid's two dimension names, e.g. the last two
+    dimensions of a field.  Raises :class:`KeyError` if the dataset has no
+    2-D longitude or latitude on those dimensions.
+    """
+    found = {}
+    for kind in ("longitude", "latitude"):
+        for var in dataset.values():
+            if var.dimensions == dims and _is_coordinate(var, kind):
+                found[kind] = var
+                break
+        else:
+            raise KeyError(f"no {kind} coordinate on dimensions {dims}")
+    mask = None
+    for var in dataset.values():
+        if var.dimensions == dims and var.name.lower().startswith("mask"):
+            mask = var
+            break
+    return found["longitude"], found["latitude"], mask
+
+
+class PointExtractor:
+    """Extracts time series at fixed points from one dataset.
+
+    Parameters
+    ----------
+    dataset:
+        An open :class:`~norkyst.reader.NorKystDataset`.
+    lon, lat:
+        Point coordinates in degrees.
+    cache_dir:
+        Where grid trees are cached; see :meth:`GridLocator.cached`.
+
+    Points are located lazily, once per horizontal grid, the first time a
+    variable on that grid is extracted.
+    """
+
+    def __init__(
+        self,
+        dataset: NorKystDataset,
+        lon: np.ndarray,
+        lat: np.ndarray,
+        cache_dir: Optional[str] = None,
+    ) -> None:
+        self.dataset = dataset
+        self.lon = np.atleast_1d(np.asarray(lon, dtype=np.float64))
+        self.lat = np.atleast_1d(np.asarray(lat, dtype=np.float64))
+        if self.lon.shape != self.lat.shape or self.lon.ndim != 1:
+            raise ValueError("lon and lat must be 1-D arrays of the same length")
+        self.cache_dir = cache_dir
+        self._indexes: Dict[Tuple[str, str], PointIndex] = {}
+        self._levels: Dict[Tuple[str, str], tuple] = {}
+
+    def index(self, variable: Union[str, Variable]) -> PointIndex:
+        """The :class:`PointIndex` of the points on ``variable``'s grid."""
+        var = self.dataset[variable] if isinstance(variable, str) else variable
+        if var.ndim < 2:
+            raise ValueError(f"{var.name!r} is not defined on a horizontal grid")
+        dims = var.dimensions[-2:]
+        index = self._indexes.get(dims)
+        if index is None:
+            lon, lat, mask = grid_variables(self.dataset, dims)
+            locator = GridLocator.cached(lon.read(), lat.read(), cache_dir=self.cache_dir)
+            index = locator.locate(self.lon, self.lat, None if mask is None else mask.read())
+            self._indexes[dims] = index
+        return index
+
+    def _sigma_levels(self, var: Variable, index: PointIndex):
+        dims = var.dimensions[-2:]
+        levels = self._levels.get(dims)
+        if levels is None:
+            ds = self.dataset
+            for name in ("h", "s_rho", "Cs_r", "hc", "Vtransform"):
+                if name not in ds:
+                    raise KeyError(f"depth interpolation needs the {name!r} variable")
+            ywin, xwin = index.window()
+            if ywin.stop == ywin.start:
+                h = np.full(len(index), np.nan)
+            else:
+                h = bilinear(ds["h"][ywin, xwin], *index.window_cells(), index.weights)
+            zeta = ds["zeta"] if "zeta" in ds else None
+            if zeta is not None and zeta.dimensions[-2:] != dims:
+                raise ValueError(f"zeta is not on the same grid as {var.name!r}")
+            vtransform = int(ds["Vtransform"][...])
+            levels = (h, zeta, ds["s_rho"][:], ds["Cs_r"][:], float(ds["hc"][...]), vtransform)
+            self._levels[dims] = levels
+        return levels
+
+    def _read(
+        self, var: Variable, index: PointIndex, start: int, stop: int, workers: Optional[int]
+    ) -> np.ndarray:
+        ywin, xwin = index.window()
+        if ywin.stop == ywin.start:
+            shape = (stop - start,) + var.shape[1:-2] + (len(index),)
+            return np.full(shape, np.nan, dtype=np.result_type(var.dtype, np.float32))
+        inner = (slice(None),) * (var.ndim - 3)
+        field = var[(slice(start, stop),) + inner + (ywin, xwin)]
+        if field.dtype.kind != "f":
+            field = field.astype(np.float64)
+        j, i = index.window_cells()
+        return bilinear(field, j, i, index.weights, workers=workers)
+
+    def stream(
+        self,
+        variable: Union[str, Variable],
+        chunk_size: Optional[int] = None,
+        max_bytes: int = 256 * 2**20,
+        depths: Optional[np.ndarray] = None,
+        workers: Optional[int] = None,
+    ) -> Iterator[Chunk]:
+        """Yield the variable at the points one block of time steps at a time.
+
+        Only the window of the grid that covers the points is read.  The
+        block length is ``chunk_size`` time steps or, if not given, as many
+        steps as fit in ``max_bytes`` of decoded data.  Points outside the
+        grid or on land are NaN.
+
+        With ``depths`` (metres, positive down) a variable on ROMS s-levels
+        is interpolated to those depths using ``h``, ``zeta`` and the
+        s-coordinate parameters in the file, and the level axis of the
+        result is replaced by a depth axis.  The file must define
+        ``Vtransform``; it is not guessed, as the two transforms give
+        different depths.  ``zeta`` is taken as zero if absent.
+
+        ``workers`` splits the points over that many threads.
+        """
+        var = self.dataset[variable] if isinstance(variable, str) else variable
+        if var.ndim < 3:
+            raise ValueError(f"{var.name!r} has no time dimension to stream over")
+        if depths is not None and var.ndim != 4:
+            raise ValueError(f"{var.name!r} has no s-level dimension to interpolate over")
+        index = self.index(var)
+        ywin, xwin = index.window()
+        ntime = var.shape[0]
+        step_bytes = (
+            int(np.prod(var.shape[1:-2], dtype=np.int64))
+            * (ywin.stop - ywin.start)
+            * (xwin.stop - xwin.start)
+            * var.dtype.itemsize
+        )
+        if chunk_size is None:
+            chunk_size = max(1, max_bytes // max(step_bytes, 1))
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be at least 1")
+        try:
+            times = self.dataset.time
+        except KeyError:
+            times = None
+        if depths is not None:
+            h, zeta, s_rho, cs_r, hc, vtransform = self._sigma_levels(var, index)
+
+        for start in range(0, ntime, chunk_size):
+            stop = min(start + chunk_size, ntime)
+            values = self._read(var, index, start, stop, workers)
+            if depths is not None:
+                if zeta is None:
+                    surface = np.zeros((stop - start, len(index)))
+                else:
+                    surface = self._read(zeta, index, start, stop, workers)
+                z = sigma_z(h, surface, s_rho, cs_r, hc, vtransform)
+                values = vertical(values, z, depths, workers=workers)
+            yield Chunk(
+                start=start,
+                time=None if times is None else times[start:stop],
+                values=values,
+            )
+
+    def extract(self, variable: Union[str, Variable], **kwargs) -> Chunk:
+        """Extract the whole time series at once; see :meth:`stream`."""
+        chunks = list(self.stream(variable, **kwargs))
+        if not chunks:
+            raise ValueError("variable has no time steps")
+        return Chunk(
+            start=0,
+            time=None if chunks[0].time is None else np.concatenate([c.time for c in chunks]),
+            values=np.concatenate([c.values for c in chunks]),
+        )
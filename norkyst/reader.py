@@ -0,0 +1,279 @@
+"""Lazy reader for NorKyst-800 NetCDF output.
+
+Opening a file only parses its header: dimensions, attributes and variable
+metadata.  Array data is read when a :class:`Variable` is indexed, and only
+the requested hyperslab is decoded.  NetCDF-3 (classic / 64-bit offset)
+files are memory-mapped through :mod:`scipy.io` so that slicing maps pages
+of the file instead of copying it; NetCDF-4 (HDF5) files are read chunk by
+chunk through :mod:`netCDF4`.
+"""
+
+from __future__ import annotations
+
+import os
+from typing import Any, Dict, Iterator, Mapping, Optional, Tuple
+
+import numpy as np
+
+__all__ = ["NorKystDataset", "Variable", "decode_time", "open_dataset"]
+
+_CLASSIC_MAGIC = (b"CDF\x01", b"CDF\x02", b"CDF\x05")
+_HDF5_MAGIC = b"\x89HDF\r\n\x1a\n"
+
+def _sniff_format(path: str) -> str:
+    with open(path, "rb") as fh:
+        magic = fh.read(8)
+    if magic[:4] in _CLASSIC_MAGIC:
+        return "classic"
+    if magic == _HDF5_MAGIC:
+        return "hdf5"
+    raise ValueError(f"{path!r} is not a NetCDF file")
+
+
+def _attr_value(value: Any) -> Any:
+    if isinstance(value, bytes):
+        return value.decode("utf-8", errors="replace")
+    if isinstance(value, np.ndarray) and value.size == 1:
+        return value.reshape(()).item()
+    return value
+
+
+class Variable:
+    """A lazily read NetCDF variable.
+
+    Indexing with basic slices (integers, slices, ``...``) reads and decodes
+    only the selected hyperslab: ``_FillValue``/``missing_value`` entries
+    become NaN, and ``scale_factor``/``add_offset`` are applied.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        raw: Any,
+        dimensions: Tuple[str, ...],
+        attrs: Dict[str, Any],
+    ) -> None:
+        self.name = name
+        self.dimensions = dimensions
+        self.attrs = attrs
+        self._raw = raw
+
+    @property
+    def shape(self) -> Tuple[int, ...]:
+        return tuple(self._raw.shape)
+
+    @property
+    def ndim(self) -> int:
+        return len(self.dimensions)
+
+    @property
+    def dtype(self) -> np.dtype:
+        """Dtype of the decoded data returned by indexing."""
+        raw = np.dtype(self._raw.dtype).newbyteorder("=")
+        scale = self.attrs.get("scale_factor")
+        offset = self.attrs.get("add_offset")
+        if scale is not None or offset is not None:
+            return np.result_type(
+                np.float32,
+                np.asarray(1 if scale is None else scale).dtype,
+                np.asarray(0 if offset is None else offset).dtype,
+            )
+        if self._fill_value is not None and raw.kind in "iu":
+            return np.dtype(np.float64)
+        return raw
+
+    @property
+    def _fill_value(self) -> Any:
+        fill = self.attrs.get("_FillValue")
+        if fill is None:
+            fill = self.attrs.get("missing_value")
+        return fill
+
+    def __len__(self) -> int:
+        return self.shape[0]
+
+    def __getitem__(self, key: Any) -> np.ndarray:
+        return self._decode(np.asarray(self._raw[key]))
+
+    def read(self) -> np.ndarray:
+        """Read and decode the whole variable."""
+        return self[...]
+
+    def _decode(self, data: np.ndarray) -> np.ndarray:
+        fill = self._fill_value
+        scale = self.attrs.get("scale_factor")
+        offset = self.attrs.get("add_offset")
+        if fill is None and scale is None and offset is None:
+            # Always copy: the raw array may be a view into a memory map
+            # that is invalidated when the dataset is closed.  NetCDF-3
+            # data is big-endian; hand back native byte order.
+            return data.astype(self.dtype, copy=True)
+        missing = None
+        if fill is not None and data.dtype.kind in "iufc":
+            fill = np.asarray(fill, dtype=data.dtype)
+            missing = np.isnan(data) if np.isnan(fill) else data == fill
+        out = data.astype(self.dtype, copy=True)
+        if scale is not None:
+            out *= scale
+        if offset is not None:
+            out += offset
+        if missing is not None and missing.any():
+            out[missing] = np.nan
+        return out
+
+    def __repr__(self) -> str:
+        dims = ", ".join(f"{d}: {n}" for d, n in zip(self.dimensions, self.shape))
+        return f"<norkyst.Variable {self.name!r} ({dims}) {self.dtype}>"
+
+
+class NorKystDataset(Mapping[str, Variable]):
+    """A NorKyst-800 output file opened for lazy reading.
+
+    The dataset behaves as a read-only mapping from variable name to
+    :class:`Variable`.  No variable data is read until a variable is indexed.
+
+    Parameters
+    ----------
+    path:
+        Path to a NetCDF-3 or NetCDF-4 file.
+    backend:
+        ``"auto"`` (default) memory-maps NetCDF-3 files with :mod:`scipy.io`
+        when scipy is installed and otherwise uses :mod:`netCDF4`.
+        ``"netcdf4"`` or ``"scipy"`` force a backend.
+    """
+
+    def __init__(self, path: "os.PathLike[str] | str", backend: str = "auto") -> None:
+        self.path = os.fspath(path)
+        fmt = _sniff_format(self.path)
+        if backend == "auto":
+            backend = "netcdf4"
+            if fmt == "classic":
+                try:
+                    import scipy.io  # noqa: F401
+                except ImportError:
+                    pass
+                else:
+                    backend = "scipy"
+        if backend == "scipy":
+            if fmt != "classic":
+                raise ValueError("the scipy backend only reads NetCDF-3 files")
+            self._open_scipy()
+        elif backend == "netcdf4":
+            self._open_netcdf4()
+        else:
+            raise ValueError(f"unknown backend {backend!r}")
+        self.backend = backend
+        self._time: Optional[np.ndarray] = None
+
+    def _open_scipy(self) -> None:
+        from scipy.io import netcdf_file
+
+        handle = netcdf_file(self.path, mode="r", mmap=True, maskandscale=False)
+        self._handle = handle
+        self.attrs = {k: _attr_value(v) for k, v in handle._attributes.items()}
+        self._variables = {
+            name: Variable(
+                name,
+                var.data,
+                tuple(var.dimensions),
+                {k: _attr_value(v) for k, v in var._attributes.items()},
+            )
+            for name, var in handle.variables.items()
+        }
+        self.dimensions = {}
+        for name, size in handle.dimensions.items():
+            if size is None:
+                size = handle._recs
+            self.dimensions[name] = int(size)
+
+    def _open_netcdf4(self) -> None:
+        import netCDF4
+
+        handle = netCDF4.Dataset(self.path, mode="r")
+        handle.set_auto_maskandscale(False)
+        self._handle = handle
+        self.attrs = {k: _attr_value(handle.getncattr(k)) for k in handle.ncattrs()}
+        self._variables = {
+            name: Variable(
+                name,
+                var,
+                tuple(var.dimensions),
+                {k: _attr_value(var.getncattr(k)) for k in var.ncattrs()},
+            )
+            for name, var in handle.variables.items()
+        }
+        self.dimensions = {name: len(dim) for name, dim in handle.dimensions.items()}
+
+    def __getitem__(self, name: str) -> Variable:
+        return self._variables[name]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._variables)
+
+    def __len__(self) -> int:
+        return len(self._variables)
+
+    @property
+    def time(self) -> np.ndarray:
+        """The ``time`` (or ``ocean_time``) coordinate as ``datetime64[s]``."""
+        if self._time is None:
+            for name in ("time", "ocean_time"):
+                if name in self._variables:
+                    self._time = decode_time(self._variables[name])
+                    break
+            else:
+                raise KeyError("dataset has no time or ocean_time variable")
+        return self._time
+
+    def close(self) -> None:
+        # Drop our views into the file first so a memory-mapped handle can
+        # release its buffer.
+        for variable in self._variables.values():
+            variable._raw = None
+        self._handle.close()
+
+    def __enter__(self) -> "NorKystDataset":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def __repr__(self) -> str:
+        dims = ", ".join(f"{d}: {n}" for d, n in self.dimensions.items())
+        return f"<norkyst.NorKystDataset {self.path!r} ({dims})>"
+
+
+def decode_time(variable: Variable) -> np.ndarray:
+    """Decode a CF ``<unit> since <epoch>`` time variable to ``datetime64[s]``.
+
+    Units are parsed by :mod:`cftime`, so any CF spelling of the epoch is
+    accepted, including a UTC offset.  Times are rounded to the second and
+    missing values become ``NaT``.  Only the standard calendar is supported.
+    """
+    import cftime
+
+    units = variable.attrs.get("units", "")
+    calendar = variable.attrs.get("calendar", "standard").lower()
+    if calendar not in ("standard", "gregorian", "proleptic_gregorian"):
+        raise ValueError(f"unsupported calendar {calendar!r}")
+    values = np.ma.masked_invalid(np.asarray(variable[...], dtype=np.float64))
+    try:
+        dates = cftime.num2date(
+            values,
+            units,
+            calendar,
+            only_use_cftime_datetimes=False,
+            only_use_python_datetimes=True,
+        )
+    except (TypeError, ValueError) as exc:
+        raise ValueError(f"cannot decode time units {units!r}") from exc
+    dates = np.ma.asarray(dates)
+    valid = ~np.ma.getmaskarray(dates)
+    out = np.full(dates.shape, np.datetime64("NaT"), dtype="datetime64[us]")
+    out[valid] = dates.data[valid]
+    return (out + np.timedelta64(500_000, "us")).astype("datetime64[s]")
+
+
+def open_dataset(path: "os.PathLike[str] | str", backend: str = "auto") -> NorKystDataset:
+    """Open a NorKyst-800 NetCDF file without reading any variable data."""
+    return NorKystDataset(path, backend=backend)
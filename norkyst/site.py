@@ -0,0 +1,333 @@
+"""Pre-render model output into static tiles for the norkyst.github.io site.
+
+For each variable and time step the horizontal field is reduced to a
+pyramid of zoom levels by 2 x 2 averaging, quantised to bytes and cut into
+square tiles in grid-index space.  The page then fetches only the tiles in
+view at the zoom level it needs instead of whole fields::
+
+    python -m norkyst.site --variable temp --variable zeta -o data file1.nc file2.nc
+
+Layout of the output directory::
+
+    index.json                      grid, zoom levels, times and variables
+    <var>/<t>/index.json            non-empty tiles of step t
+    <var>/<t>/<zoom>/<ty>_<tx>.png  one tile, indexed-colour PNG
+
+Tiles are ``tile_size`` square except along the top and right edges of a
+zoom level, where they are cut to the level's shape.  Each pixel's palette
+index ``q`` is 0 for no data (land, outside the grid, transparent) and
+otherwise encodes ``vmin + (q - 1) / 254 * (vmax - vmin)``.  The range is
+fixed per variable over all rendered steps and stored with the variable
+in ``index.json``, so a colour means the same value at every step.  The
+palette is a blue-white-red ramp, so browsers decode and colour the tiles
+natively.  Images are north-up: the first PNG row is the
+tile's highest ``eta`` row.  Tiles with no data are not written.
+"""
+
+from __future__ import annotations
+
+import argparse
+import itertools
+import json
+import os
+import struct
+import sys
+import zlib
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+from norkyst.extract import grid_variables
+from norkyst.reader import NorKystDataset, Variable, open_dataset
+
+__all__ = ["build_site", "downsample", "quantize"]
+
+FORMAT_VERSION = 3
+_LEVELS = 254
+
+
+def _palette() -> np.ndarray:
+    x = np.clip((np.arange(256) - 1) / _LEVELS, 0.0, 1.0)
+    red = np.where(x < 0.5, 2 * x, 1.0)
+    green = 1 - np.abs(2 * x - 1)
+    blue = np.where(x < 0.5, 1.0, 2 * (1 - x))
+    rgb = np.round(255 * np.stack([red, green, blue], axis=1)).astype(np.uint8)
+    rgb[0] = 0
+    return rgb
+
+
+PALETTE = _palette()
+
+
+def downsample(field: np.ndarray) -> np.ndarray:
+    """Average 2 x 2 blocks of a 2-D field, ignoring NaN.
+
+    Odd trailing rows or columns are averaged on their own.
+    """
+    ny, nx = field.shape
+    padded = np.full((ny + ny % 2, nx + nx % 2), np.nan)
+    padded[:ny, :nx] = field
+    valid = ~np.isnan(padded)
+    blocks = (padded.shape[0] // 2, 2, padded.shape[1] // 2, 2)
+    total = np.where(valid, padded, 0.0).reshape(blocks).sum(axis=(1, 3))
+    count = valid.reshape(blocks).sum(axis=(1, 3))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(count > 0, total / count, np.nan)
+
+
+def quantize(field: np.ndarray, vmin: float, vmax: float) -> np.ndarray:
+    """Encode a field as ``uint8`` with 0 for NaN; see the module docstring."""
+    span = vmax - vmin if vmax > vmin else 1.0
+    with np.errstate(invalid="ignore"):
+        scaled = np.clip(np.round((field - vmin) / span * _LEVELS), 0, _LEVELS)
+    return np.where(np.isnan(field), 0, scaled + 1).astype(np.uint8)
+
+
+def _pyramid(field: np.ndarray, tile_size: int) -> List[np.ndarray]:
+    """Zoom levels of a field, coarsest (one tile) first."""
+    levels = [field]
+    while max(levels[-1].shape) > tile_size:
+        levels.append(downsample(levels[-1]))
+    return levels[::-1]
+
+
+def _horizontal_slice(var: Variable, t: int, level: Optional[int]) -> np.ndarray:
+    if var.ndim < 3:
+        raise ValueError(f"{var.name!r} has no time dimension")
+    if level is None:
+        # ROMS s-levels run bottom to top; z-level files start at the surface.
+        level = -1 if var.ndim > 3 and var.dimensions[1].startswith("s_") else 0
+    key = (t,) + (level,) * (var.ndim - 3) + (slice(None), slice(None))
+    return np.asarray(var[key], dtype=np.float64)
+
+
+def _write_step(
+    field: np.ndarray,
+    directory: str,
+    tile_size: int,
+    vmin: Optional[float],
+    vmax: Optional[float],
+) -> Dict[str, Any]:
+    if vmin is None or vmax is None or np.isnan(field).all():
+        return {"tiles": []}
+    tiles = []
+    for zoom, level in enumerate(_pyramid(field, tile_size)):
+        q = quantize(level, vmin, vmax)
+        present = []
+        for ty in range(0, q.shape[0], tile_size):
+            for tx in range(0, q.shape[1], tile_size):
+                block = q[ty : ty + tile_size, tx : tx + tile_size]
+                if not block.any():
+                    continue
+                os.makedirs(os.path.join(directory, str(zoom)), exist_ok=True)
+                name = f"{ty // tile_size}_{tx // tile_size}.png"
+                with open(os.path.join(directory, str(zoom), name), "wb") as fh:
+                    fh.write(_encode_png(block[::-1]))
+                present.append([ty // tile_size, tx // tile_size])
+        tiles.append(present)
+    return {"tiles": tiles}
+
+
+def _png_chunk(kind: bytes, data: bytes) -> bytes:
+    return (
+        struct.pack(">I", len(data))
+        + kind
+        + data
+        + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF)
+    )
+
+
+def _encode_png(indices: np.ndarray) -> bytes:
+    """Encode 2-D palette indices as an 8-bit indexed PNG with :data:`PALETTE`.
+
+    Index 0 is fully transparent.
+    """
+    height, width = indices.shape
+    rows = np.zeros((height, width + 1), dtype=np.uint8)  # filter byte 0 per row
+    rows[:, 1:] = indices
+    alpha = np.full(256, 255, dtype=np.uint8)
+    alpha[0] = 0
+    return b"".join(
+        [
+            b"\x89PNG\r\n\x1a\n",
+            _png_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 3, 0, 0, 0)),
+            _png_chunk(b"PLTE", PALETTE.tobytes()),
+            _png_chunk(b"tRNS", alpha.tobytes()),
+            _png_chunk(b"IDAT", zlib.compress(rows.tobytes(), 9)),
+            _png_chunk(b"IEND", b""),
+        ]
+    )
+
+
+def _write_json(path: str, data: Dict[str, Any]) -> None:
+    with open(path, "w") as fh:
+        json.dump(data, fh, separators=(",", ":"))
+
+
+def _each_step(
+    steps: Sequence[Tuple["os.PathLike[str] | str", int]]
+) -> Iterator[Tuple[int, NorKystDataset, int]]:
+    """Yield ``(step, dataset, t)`` for ``(path, t)`` steps, opening each file once."""
+    for path, group in itertools.groupby(enumerate(steps), key=lambda s: s[1][0]):
+        with open_dataset(path) as ds:
+            for step, (_, t) in group:
+                yield step, ds, t
+
+
+def build_site(
+    paths: Sequence["os.PathLike[str] | str"],
+    out_dir: "os.PathLike[str] | str",
+    variables: Sequence[str],
+    tile_size: int = 256,
+    level: Optional[int] = None,
+    time_stride: int = 1,
+    ranges: Optional[Mapping[str, Tuple[float, float]]] = None,
+) -> Dict[str, Any]:
+    """Render tiles and indexes for ``variables`` from files on one grid.
+
+    Time steps of the files are numbered consecutively in the order given,
+    keeping every ``time_stride``-th step.  ``level`` picks the vertical
+    index of 4-D variables; by default the surface.  ``ranges`` maps
+    variables to a fixed ``(vmin, vmax)`` colour range, with values
+    outside it clipped; the range of the other variables is their minimum
+    and maximum over all kept steps, found in a first pass over the files.
+    Fields are read one time step at a time.  Returns the contents written
+    to ``index.json``.
+    """
+    if tile_size < 1 or time_stride < 1:
+        raise ValueError("tile_size and time_stride must be positive")
+    if not variables:
+        raise ValueError("no variables to render")
+    limits: Dict[str, Tuple[Optional[float], Optional[float]]] = {}
+    for name, (vmin, vmax) in (ranges or {}).items():
+        if not vmin <= vmax:
+            raise ValueError(f"empty range {vmin} .. {vmax} for {name!r}")
+        limits[name] = (float(vmin), float(vmax))
+    out_dir = os.fspath(out_dir)
+    os.makedirs(out_dir, exist_ok=True)
+    index: Dict[str, Any] = {"version": FORMAT_VERSION, "tile_size": tile_size, "times": []}
+    steps: List[Tuple["os.PathLike[str] | str", int]] = []
+    seen = 0  # time steps in the files before this one
+    for path in paths:
+        with open_dataset(path) as ds:
+            if "grid" not in index:
+                index["grid"] = _describe_grid(ds, ds[variables[0]], tile_size)
+                index["variables"] = {
+                    name: {
+                        key: ds[name].attrs[key]
+                        for key in ("long_name", "standard_name", "units")
+                        if key in ds[name].attrs
+                    }
+                    for name in variables
+                }
+            shape = tuple(index["grid"]["shape"])
+            for name in variables:
+                if ds[name].shape[-2:] != shape:
+                    raise ValueError(f"{name!r} in {os.fspath(path)!r} is not on the site grid")
+            times = ds.time
+            # The stride runs over all files together, not per file.
+            for t in range(-seen % time_stride, len(times), time_stride):
+                steps.append((path, t))
+                index["times"].append(str(times[t]) + "Z")
+            seen += len(times)
+
+    scan = [name for name in variables if name not in limits]
+    if scan:
+        low = dict.fromkeys(scan, np.inf)
+        high = dict.fromkeys(scan, -np.inf)
+        for _, ds, t in _each_step(steps):
+            for name in scan:
+                field = _horizontal_slice(ds[name], t, level)
+                if not np.isnan(field).all():
+                    low[name] = min(low[name], float(np.nanmin(field)))
+                    high[name] = max(high[name], float(np.nanmax(field)))
+        for name in scan:
+            found = low[name] <= high[name]
+            limits[name] = (low[name], high[name]) if found else (None, None)
+    for name in variables:
+        index["variables"][name]["vmin"], index["variables"][name]["vmax"] = limits[name]
+
+    for step, ds, t in _each_step(steps):
+        for name in variables:
+            directory = os.path.join(out_dir, name, str(step))
+            os.makedirs(directory, exist_ok=True)
+            field = _horizontal_slice(ds[name], t, level)
+            entry = _write_step(field, directory, tile_size, *limits[name])
+            _write_json(os.path.join(directory, "index.json"), entry)
+    _write_json(os.path.join(out_dir, "index.json"), index)
+    return index
+
+
+def _describe_grid(ds: NorKystDataset, var: Variable, tile_size: int) -> Dict[str, Any]:
+    ny, nx = var.shape[-2:]
+    grid: Dict[str, Any] = {"shape": [ny, nx]}
+    try:
+        lon, lat, _ = grid_variables(ds, var.dimensions[-2:])
+    except KeyError:
+        pass
+    else:
+        lon, lat = lon.read(), lat.read()
+        grid["bbox"] = [
+            float(np.nanmin(lon)),
+            float(np.nanmin(lat)),
+            float(np.nanmax(lon)),
+            float(np.nanmax(lat)),
+        ]
+    levels = []
+    size = (ny, nx)
+    while True:
+        levels.append(size)
+        if max(size) <= tile_size:
+            break
+        size = ((size[0] + 1) // 2, (size[1] + 1) // 2)
+    grid["zooms"] = [
+        {"shape": list(s), "factor": 2 ** (len(levels) - 1 - z)}
+        for z, s in enumerate(levels[::-1])
+    ]
+    return grid
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m norkyst.site", description="Render static map tiles for the site."
+    )
+    parser.add_argument("paths", nargs="+", help="NorKyst NetCDF files, in time order")
+    parser.add_argument("-o", "--output", default="data", help="output directory")
+    parser.add_argument(
+        "-v", "--variable", action="append", required=True, help="variable to render"
+    )
+    parser.add_argument("--tile-size", type=int, default=256)
+    parser.add_argument("--level", type=int, help="vertical index of 4-D variables")
+    parser.add_argument("--time-stride", type=int, default=1, help="keep every n-th step")
+    parser.add_argument(
+        "--range",
+        nargs=3,
+        action="append",
+        default=[],
+        metavar=("VAR", "VMIN", "VMAX"),
+        help="fixed colour range of a variable (default: its range over all steps)",
+    )
+    args = parser.parse_args(argv)
+    try:
+        ranges = {name: (float(vmin), float(vmax)) for name, vmin, vmax in args.range}
+    except ValueError:
+        parser.error("--range takes a variable name and two numbers")
+    index = build_site(
+        args.paths,
+        args.output,
+        args.variable,
+        tile_size=args.tile_size,
+        level=args.level,
+        time_stride=args.time_stride,
+        ranges=ranges,
+    )
+    print(
+        f"wrote {len(index['times'])} time steps of {len(args.variable)} variables "
+        f"to {args.output}",
+        file=sys.stderr,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
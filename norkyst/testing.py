@@ -0,0 +1,128 @@
+"""Synthetic ROMS-style NorKyst files for offline tests and benchmarks.
+
+The fields are affine in grid-index space and time::
+
+    temp[t, k, j, i] = 5 + 0.01 * i + 0.02 * j + 0.1 * t - 0.5 * k
+    zeta[t, j, i]    = 0.001 * (i - j) + 0.01 * t
+
+so bilinear interpolation recovers them exactly at any point whose
+fractional grid position is known.  Use :func:`grid_position` to map grid
+indices to coordinates when choosing points to check against.
+"""
+
+from __future__ import annotations
+
+import os
+from typing import Tuple
+
+import numpy as np
+
+__all__ = ["grid_position", "write_synthetic_roms"]
+
+EPOCH = "seconds since 1970-01-01 00:00:00"
+START = 1704067200  # 2024-01-01T00:00:00Z
+_LON0, _LAT0 = 4.0, 58.0
+_DX, _DY = 0.0125, 0.0075
+_ROTATION = np.radians(25.0)
+
+
+def grid_position(j: np.ndarray, i: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Longitude and latitude of (possibly fractional) grid indices.
+
+    The grid is a rotated, gently curved lattice off the Norwegian coast.
+    It is not exactly bilinear between nodes, so fractional positions are
+    accurate to a small fraction of a cell.
+    """
+    j = np.asarray(j, dtype=np.float64)
+    i = np.asarray(i, dtype=np.float64)
+    x = i * np.cos(_ROTATION) - j * np.sin(_ROTATION)
+    y = i * np.sin(_ROTATION) + j * np.cos(_ROTATION)
+    lat = _LAT0 + _DY * y + 1e-6 * x**2
+    lon = _LON0 + _DX * x
+    return lon, lat
+
+
+def write_synthetic_roms(
+    path: "os.PathLike[str] | str",
+    ny: int = 40,
+    nx: int = 60,
+    nt: int = 12,
+    nz: int = 4,
+    land: bool = True,
+    format: str = "NETCDF4",
+) -> str:
+    """Write a small ROMS-style file with a curvilinear rho grid.
+
+    The file holds ``ocean_time``, ``lon_rho``/``lat_rho``, ``mask_rho``,
+    ``h`` and the s-coordinate parameters (``s_rho``, ``Cs_r``, ``hc``,
+    ``Vtransform``) together with ``zeta`` and a ``temp`` field stored as
+    scaled ``int16`` with a ``_FillValue`` on land.  With ``land=True`` a
+    rectangular island covers part of the domain.  ``format`` is any
+    :mod:`netCDF4` format, e.g. ``"NETCDF3_64BIT_OFFSET"`` for a file that
+    is read through the memory-mapped backend.
+    """
+    import netCDF4
+
+    path = os.fspath(path)
+    jj, ii = np.meshgrid(np.arange(ny), np.arange(nx), indexing="ij")
+    lon, lat = grid_position(jj, ii)
+    mask = np.ones((ny, nx), dtype=np.float64)
+    if land:
+        mask[ny // 4 : ny // 2, nx // 4 : nx // 2] = 0.0
+    h = 20.0 + 280.0 * ii / max(nx - 1, 1)
+
+    s_rho = (np.arange(nz) - nz + 0.5) / nz
+    cs_r = s_rho * np.abs(s_rho)
+
+    with netCDF4.Dataset(path, "w", format=format) as ds:
+        ds.title = "Synthetic NorKyst-800 test file"
+        ds.createDimension("ocean_time", None)
+        ds.createDimension("s_rho", nz)
+        ds.createDimension("eta_rho", ny)
+        ds.createDimension("xi_rho", nx)
+
+        time = ds.createVariable("ocean_time", "f8", ("ocean_time",))
+        time.units = EPOCH
+        time.calendar = "gregorian"
+        time[:] = START + 3600.0 * np.arange(nt)
+
+        for name, value, dims in (
+            ("s_rho", s_rho, ("s_rho",)),
+            ("Cs_r", cs_r, ("s_rho",)),
+            ("lon_rho", lon, ("eta_rho", "xi_rho")),
+            ("lat_rho", lat, ("eta_rho", "xi_rho")),
+            ("mask_rho", mask, ("eta_rho", "xi_rho")),
+            ("h", h, ("eta_rho", "xi_rho")),
+        ):
+            ds.createVariable(name, "f8", dims)[:] = value
+        ds["lon_rho"].standard_name = "longitude"
+        ds["lat_rho"].standard_name = "latitude"
+        ds.createVariable("hc", "f8", ())[...] = 10.0
+        ds.createVariable("Vtransform", "i4", ())[...] = 2
+
+        zeta = ds.createVariable(
+            "zeta", "f4", ("ocean_time", "eta_rho", "xi_rho"), fill_value=np.float32(1e37)
+        )
+        zeta.units = "meter"
+        temp = ds.createVariable(
+            "temp",
+            "i2",
+            ("ocean_time", "s_rho", "eta_rho", "xi_rho"),
+            fill_value=np.int16(-32767),
+        )
+        temp.units = "Celsius"
+        temp.scale_factor = np.float32(0.002)
+        temp.add_offset = np.float32(20.0)
+        ds.set_auto_maskandscale(False)
+
+        land_mask = mask == 0
+        for t in range(nt):
+            z = (0.001 * (ii - jj) + 0.01 * t).astype(np.float32)
+            z[land_mask] = np.float32(1e37)
+            zeta[t] = z
+            k = np.arange(nz)[:, None, None]
+            value = 5.0 + 0.01 * ii + 0.02 * jj + 0.1 * t - 0.5 * k
+            packed = np.round((value - 20.0) / 0.002).astype(np.int16)
+            packed[:, land_mask] = -32767
+            temp[t] = packed
+    return path
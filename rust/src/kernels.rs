@@ -0,0 +1,199 @@
+//! Interpolation kernels, free of any Python types.
+//!
+//! These mirror `norkyst._interp` operation for operation (same accumulation
+//! order, all arithmetic in f64) so that the compiled and NumPy paths are
+//! meant to return bit-identical results.
+
+/// Bilinear interpolation with NaN-aware renormalisation.
+///
+/// `field` is a C-ordered `(lead, ny, nx)` array, `j`/`i` the lower-left
+/// cell corners and `weights` the `(n, 4)` corner weights of each point.
+/// Writes a `(lead, n)` array to `out`.
+pub fn bilinear<T: Copy + Into<f64>>(
+    field: &[T],
+    lead: usize,
+    ny: usize,
+    nx: usize,
+    j: &[i64],
+    i: &[i64],
+    weights: &[f64],
+    out: &mut [f64],
+) -> Result<(), String> {
+    let n = j.len();
+    if i.len() != n || weights.len() != 4 * n {
+        return Err("j, i and weights describe different numbers of points".into());
+    }
+    if field.len() != lead * ny * nx || out.len() != lead * n {
+        return Err("array sizes do not match the given shape".into());
+    }
+    let mut offsets = Vec::with_capacity(n);
+    for p in 0..n {
+        let (jp, ip) = (j[p], i[p]);
+        if jp < 0 || ip < 0 || jp as usize + 1 >= ny || ip as usize + 1 >= nx {
+            return Err(format!("cell ({jp}, {ip}) is outside the {ny} x {nx} field"));
+        }
+        offsets.push(jp as usize * nx + ip as usize);
+    }
+    let plane = ny * nx;
+    for l in 0..lead {
+        let base = &field[l * plane..(l + 1) * plane];
+        let row = &mut out[l * n..(l + 1) * n];
+        for p in 0..n {
+            let o = offsets[p];
+            let corners = [base[o], base[o + 1], base[o + nx], base[o + nx + 1]];
+            let w = &weights[4 * p..4 * p + 4];
+            let mut num = 0.0f64;
+            let mut den = 0.0f64;
+            for k in 0..4 {
+                let v: f64 = corners[k].into();
+                if !v.is_nan() && w[k] > 0.0 {
+                    num += v * w[k];
+                    den += w[k];
+                }
+            }
+            row[p] = if den > 0.0 { num / den } else { f64::NAN };
+        }
+    }
+    Ok(())
+}
+
+/// Linear interpolation of s-level columns to fixed heights.
+///
+/// `values` and `z` are C-ordered `(lead, nz, n)` arrays with `z` increasing
+/// along the level axis (bottom first, as in ROMS).  `targets` are heights
+/// relative to the mean surface (negative below it).  Targets above the top
+/// level take the top value; targets below the bottom level are NaN.
+/// Writes a `(lead, targets.len(), n)` array to `out`.
+pub fn vertical(
+    values: &[f64],
+    z: &[f64],
+    lead: usize,
+    nz: usize,
+    n: usize,
+    targets: &[f64],
+    out: &mut [f64],
+) -> Result<(), String> {
+    let nd = targets.len();
+    if nz == 0 {
+        return Err("columns must have at least one level".into());
+    }
+    if values.len() != lead * nz * n || z.len() != values.len() || out.len() != lead * nd * n {
+        return Err("array sizes do not match the given shape".into());
+    }
+    for l in 0..lead {
+        let v = &values[l * nz * n..(l + 1) * nz * n];
+        let zl = &z[l * nz * n..(l + 1) * nz * n];
+        let o = &mut out[l * nd * n..(l + 1) * nd * n];
+        for p in 0..n {
+            for (d, &zt) in targets.iter().enumerate() {
+                let top = (nz - 1) * n + p;
+                o[d * n + p] = if zt >= zl[top] {
+                    v[top]
+                } else {
+                    let mut result = f64::NAN;
+                    for k in 0..nz - 1 {
+                        let (z0, z1) = (zl[k * n + p], zl[(k + 1) * n + p]);
+                        if z0 <= zt && zt < z1 {
+                            let (v0, v1) = (v[k * n + p], v[(k + 1) * n + p]);
+                            let frac = (zt - z0) / (z1 - z0);
+                            result = v0 + frac * (v1 - v0);
+                            break;
+                        }
+                    }
+                    result
+                };
+            }
+        }
+    }
+    Ok(())
+}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+
+    // 2 x 3 x 4 field: value = 100 * l + 10 * j + i.
+    fn field() -> Vec<f64> {
+        let mut f = Vec::new();
+        for l in 0..2 {
+            for j in 0..3 {
+                for i in 0..4 {
+                    f.push((100 * l + 10 * j + i) as f64);
+                }
+            }
+        }
+        f
+    }
+
+    #[test]
+    fn bilinear_is_exact_for_affine_fields() {
+        let f = field();
+        let weights = [0.25, 0.25, 0.25, 0.25, 0.5, 0.5, 0.0, 0.0];
+        let mut out = [0.0; 4];
+        bilinear(&f, 2, 3, 4, &[0, 1], &[0, 2], &weights, &mut out).unwrap();
+        assert_eq!(out, [5.5, 12.5, 105.5, 112.5]);
+    }
+
+    #[test]
+    fn bilinear_renormalises_around_nan_and_zero_weights() {
+        let mut f = field();
+        f[0] = f64::NAN; // corner (0, 0) of the first layer
+        let weights = [0.4, 0.3, 0.2, 0.1];
+        let mut out = [0.0; 2];
+        bilinear(&f, 2, 3, 4, &[0], &[0], &weights, &mut out).unwrap();
+        assert_eq!(out[0], (0.3 * 1.0 + 0.2 * 10.0 + 0.1 * 11.0) / (0.3 + 0.2 + 0.1));
+        let total = 0.4 * 100.0 + 0.3 * 101.0 + 0.2 * 110.0 + 0.1 * 111.0;
+        assert_eq!(out[1], total / (0.4 + 0.3 + 0.2 + 0.1));
+
+        let mut out = [0.0; 2];
+        bilinear(&f, 2, 3, 4, &[0], &[0], &[1.0, 0.0, 0.0, 0.0], &mut out).unwrap();
+        assert!(out[0].is_nan());
+        assert_eq!(out[1], 100.0);
+        bilinear(&f, 2, 3, 4, &[0], &[0], &[0.0; 4], &mut out).unwrap();
+        assert!(out[0].is_nan() && out[1].is_nan());
+    }
+
+    #[test]
+    fn bilinear_accepts_f32() {
+        let f: Vec<f32> = field().iter().map(|&v| v as f32).collect();
+        let mut out = [0.0; 2];
+        bilinear(&f, 2, 3, 4, &[1], &[1], &[0.25; 4], &mut out).unwrap();
+        assert_eq!(out, [16.5, 116.5]);
+    }
+
+    #[test]
+    fn bilinear_rejects_bad_input() {
+        let f = field();
+        let mut out = [0.0; 2];
+        assert!(bilinear(&f, 2, 3, 4, &[2], &[0], &[0.25; 4], &mut out).is_err());
+        assert!(bilinear(&f, 2, 3, 4, &[0], &[3], &[0.25; 4], &mut out).is_err());
+        assert!(bilinear(&f, 2, 3, 4, &[-1], &[0], &[0.25; 4], &mut out).is_err());
+        assert!(bilinear(&f, 2, 3, 4, &[0, 0], &[0], &[0.25; 8], &mut [0.0; 4]).is_err());
+    }
+
+    #[test]
+    fn vertical_interpolates_between_levels() {
+        // One column of three levels at z = -30, -10, -2 with values 3, 1, 0.
+        let values = [3.0, 1.0, 0.0];
+        let z = [-30.0, -10.0, -2.0];
+        let targets = [0.0, -2.0, -6.0, -10.0, -20.0, -30.0, -31.0];
+        let mut out = [0.0; 7];
+        vertical(&values, &z, 1, 3, 1, &targets, &mut out).unwrap();
+        assert_eq!(&out[..5], &[0.0, 0.0, 0.5, 1.0, 2.0]);
+        assert_eq!(out[5], 3.0);
+        assert!(out[6].is_nan());
+    }
+
+    #[test]
+    fn vertical_handles_nan_and_single_level_columns() {
+        let mut out = [0.0; 1];
+        vertical(&[1.0, 2.0], &[f64::NAN, f64::NAN], 1, 2, 1, &[-5.0], &mut out).unwrap();
+        assert!(out[0].is_nan());
+
+        let mut out = [0.0; 2];
+        vertical(&[7.0], &[-3.0], 1, 1, 1, &[-1.0, -4.0], &mut out).unwrap();
+        assert_eq!(out[0], 7.0);
+        assert!(out[1].is_nan());
+        assert!(vertical(&[], &[], 1, 0, 1, &[0.0], &mut []).is_err());
+    }
+}
@@ -0,0 +1,93 @@
+//! Compiled interpolation kernels for the `norkyst` package.
+//!
+//! Exposed to Python as the `norkyst_ext` module and used by
+//! `norkyst._interp` when installed.  Every function releases the GIL while
+//! it runs, so callers can spread points over a thread pool.
+
+use numpy::ndarray::{Array2, Array3};
+use numpy::{
+    Element, IntoPyArray, PyArray2, PyArray3, PyReadonlyArray1, PyReadonlyArray2,
+    PyReadonlyArray3, PyUntypedArrayMethods,
+};
+use pyo3::exceptions::PyValueError;
+use pyo3::prelude::*;
+
+mod kernels;
+
+fn bilinear_impl<'py, T: Element + Copy + Into<f64> + Send + Sync>(
+    py: Python<'py>,
+    field: PyReadonlyArray3<'py, T>,
+    j: PyReadonlyArray1<'py, i64>,
+    i: PyReadonlyArray1<'py, i64>,
+    weights: PyReadonlyArray2<'py, f64>,
+) -> PyResult<Bound<'py, PyArray2<f64>>> {
+    let (lead, ny, nx) = match *field.shape() {
+        [lead, ny, nx] => (lead, ny, nx),
+        _ => unreachable!("PyReadonlyArray3 is three-dimensional"),
+    };
+    let n = j.len();
+    let field = field.as_slice()?;
+    let (j, i, weights) = (j.as_slice()?, i.as_slice()?, weights.as_slice()?);
+    let mut out = vec![0.0f64; lead * n];
+    py.allow_threads(|| kernels::bilinear(field, lead, ny, nx, j, i, weights, &mut out))
+        .map_err(PyValueError::new_err)?;
+    let out = Array2::from_shape_vec((lead, n), out).expect("output has lead * n elements");
+    Ok(out.into_pyarray_bound(py))
+}
+
+/// Bilinear interpolation of a C-contiguous float32 (lead, ny, nx) field.
+#[pyfunction]
+fn bilinear_f32<'py>(
+    py: Python<'py>,
+    field: PyReadonlyArray3<'py, f32>,
+    j: PyReadonlyArray1<'py, i64>,
+    i: PyReadonlyArray1<'py, i64>,
+    weights: PyReadonlyArray2<'py, f64>,
+) -> PyResult<Bound<'py, PyArray2<f64>>> {
+    bilinear_impl(py, field, j, i, weights)
+}
+
+/// Bilinear interpolation of a C-contiguous float64 (lead, ny, nx) field.
+#[pyfunction]
+fn bilinear_f64<'py>(
+    py: Python<'py>,
+    field: PyReadonlyArray3<'py, f64>,
+    j: PyReadonlyArray1<'py, i64>,
+    i: PyReadonlyArray1<'py, i64>,
+    weights: PyReadonlyArray2<'py, f64>,
+) -> PyResult<Bound<'py, PyArray2<f64>>> {
+    bilinear_impl(py, field, j, i, weights)
+}
+
+/// Interpolate C-contiguous float64 (lead, nz, n) s-level columns to heights.
+#[pyfunction]
+fn vertical<'py>(
+    py: Python<'py>,
+    values: PyReadonlyArray3<'py, f64>,
+    z: PyReadonlyArray3<'py, f64>,
+    targets: PyReadonlyArray1<'py, f64>,
+) -> PyResult<Bound<'py, PyArray3<f64>>> {
+    let (lead, nz, n) = match *values.shape() {
+        [lead, nz, n] => (lead, nz, n),
+        _ => unreachable!("PyReadonlyArray3 is three-dimensional"),
+    };
+    if z.shape() != values.shape() {
+        return Err(PyValueError::new_err("values and z must have the same shape"));
+    }
+    let (values, z, targets) = (values.as_slice()?, z.as_slice()?, targets.as_slice()?);
+    let nd = targets.len();
+    let mut out = vec![0.0f64; lead * nd * n];
+    py.allow_threads(|| kernels::vertical(values, z, lead, nz, n, targets, &mut out))
+        .map_err(PyValueError::new_err)?;
+    let out =
+        Array3::from_shape_vec((lead, nd, n), out).expect("output has lead * nd * n elements");
+    Ok(out.into_pyarray_bound(py))
+}
+
+#[pymodule]
+fn norkyst_ext(m: &Bound<'_, PyModule>) -> PyResult<()> {
+    m.add_function(wrap_pyfunction!(bilinear_f32, m)?)?;
+    m.add_function(wrap_pyfunction!(bilinear_f64, m)?)?;
+    m.add_function(wrap_pyfunction!(vertical, m)?)?;
+    Ok(())
+}
@@ -0,0 +1,245 @@
+import os
+import pickle
+
+import numpy as np
+import pytest
+
+from norkyst import extract
+from norkyst.extract import GridLocator, PointExtractor, section_points
+from norkyst.reader import open_dataset
+from norkyst.testing import START, grid_position, write_synthetic_roms
+
+NY, NX, NT, NZ = 40, 60, 12, 4
+FORMATS = ["NETCDF4", "NETCDF3_64BIT_OFFSET"]
+# Quantisation of the packed int16 temp is 0.002; the synthetic grid is not
+# exactly bilinear between nodes, which adds a little on top.
+ATOL = 2e-3
+
+
+def expected_temp(j, i):
+    t = np.arange(NT)[:, None, None]
+    k = np.arange(NZ)[None, :, None]
+    return 5.0 + 0.01 * i + 0.02 * j + 0.1 * t - 0.5 * k
+
+
+def expected_zeta(j, i):
+    return 0.001 * (i - j) + 0.01 * np.arange(NT)[:, None]
+
+
+@pytest.fixture(autouse=True)
+def isolated_cache(tmp_path, monkeypatch):
+    cache = tmp_path / "cache"
+    monkeypatch.setenv("NORKYST_CACHE", str(cache))
+    monkeypatch.setattr(extract, "_locators", {})
+    return cache
+
+
+@pytest.fixture(params=FORMATS)
+def roms(request, tmp_path):
+    return write_synthetic_roms(
+        tmp_path / f"{request.param}.nc", ny=NY, nx=NX, nt=NT, nz=NZ, format=request.param
+    )
+
+
+def sea_points(n=200, seed=0):
+    # Away from the island at j 10..19, i 15..29 so every corner is wet.
+    rng = np.random.default_rng(seed)
+    j = np.concatenate([rng.uniform(0, 8, n // 2), rng.uniform(21, NY - 1, n - n // 2)])
+    i = rng.uniform(0, NX - 1, n)
+    return j, i
+
+
+def test_values_match_analytic_fields(roms):
+    j, i = sea_points()
+    lon, lat = grid_position(j, i)
+    with open_dataset(roms) as ds:
+        ex = PointExtractor(ds, lon, lat)
+        temp = ex.extract("temp")
+        zeta = ex.extract("zeta")
+    assert temp.values.shape == (NT, NZ, len(j))
+    np.testing.assert_allclose(temp.values, expected_temp(j, i), atol=ATOL)
+    np.testing.assert_allclose(zeta.values, expected_zeta(j, i), atol=1e-4)
+    assert temp.time[0] == np.datetime64(START, "s")
+    assert np.all(np.diff(temp.time) == np.timedelta64(3600, "s"))
+
+
+def test_land_and_outside_points_are_nan(roms):
+    j, i = sea_points(20)
+    lon, lat = grid_position(j, i)
+    land_lon, land_lat = grid_position(15.0, 22.0)
+    lon = np.concatenate([lon, [land_lon, 4.0, 30.0]])
+    lat = np.concatenate([lat, [land_lat, 80.0, 58.5]])
+    with open_dataset(roms) as ds:
+        ex = PointExtractor(ds, lon, lat)
+        index = ex.index("temp")
+        assert index.inside.tolist() == [True] * 20 + [False] * 3
+        temp = ex.extract("temp", chunk_size=5).values
+        zeta = ex.extract("zeta").values
+        depth = ex.extract("temp", depths=[0.0, 10.0]).values
+    assert np.isnan(temp[..., 20:]).all()
+    assert np.isnan(zeta[..., 20:]).all()
+    assert np.isnan(depth[..., 20:]).all()
+    np.testing.assert_allclose(temp[..., :20], expected_temp(j, i), atol=ATOL)
+    assert not np.isnan(depth[:, 0, :20]).any()
+
+
+def test_single_sea_point_next_to_land(roms):
+    # A window only a few cells wide, with a land point far outside it.
+    lon, lat = grid_position(np.array([3.5, 15.0]), np.array([4.5, 22.0]))
+    with open_dataset(roms) as ds:
+        values = PointExtractor(ds, lon, lat).extract("temp").values
+    np.testing.assert_allclose(values[..., 0], expected_temp(3.5, 4.5)[..., 0], atol=ATOL)
+    assert np.isnan(values[..., 1]).all()
+
+
+def test_no_point_on_grid(roms):
+    with open_dataset(roms) as ds:
+        chunk = PointExtractor(ds, [30.0], [80.0]).extract("temp", depths=[5.0])
+    assert chunk.values.shape == (NT, 1, 1)
+    assert np.isnan(chunk.values).all()
+
+
+def test_coast_renormalises_weights(roms):
+    # On the island's western edge: two corners wet, two on land.
+    lon, lat = grid_position(np.array([15.5]), np.array([14.5]))
+    with open_dataset(roms) as ds:
+        values = PointExtractor(ds, lon, lat).extract("temp").values
+    np.testing.assert_allclose(values[..., 0], expected_temp(15.5, 14.0)[..., 0], atol=ATOL)
+
+
+def test_chunk_size(roms):
+    j, i = sea_points(50)
+    lon, lat = grid_position(j, i)
+    with open_dataset(roms) as ds:
+        ex = PointExtractor(ds, lon, lat)
+        chunks = list(ex.stream("temp", chunk_size=5))
+        full = ex.extract("temp", chunk_size=NT).values
+    assert [c.start for c in chunks] == [0, 5, 10]
+    assert [c.values.shape[0] for c in chunks] == [5, 5, 2]
+    assert [len(c.time) for c in chunks] == [5, 5, 2]
+    np.testing.assert_array_equal(np.concatenate([c.values for c in chunks]), full)
+
+
+def test_max_bytes(roms):
+    j, i = sea_points(50)
+    lon, lat = grid_position(j, i)
+    with open_dataset(roms) as ds:
+        ex = PointExtractor(ds, lon, lat)
+        ywin, xwin = ex.index("temp").window()
+        step = NZ * (ywin.stop - ywin.start) * (xwin.stop - xwin.start) * ds["temp"].dtype.itemsize
+        lengths = [c.values.shape[0] for c in ex.stream("temp", max_bytes=3 * step + 1)]
+        assert lengths == [3, 3, 3, 3]
+        lengths = [c.values.shape[0] for c in ex.stream("temp", max_bytes=1)]
+        assert lengths == [1] * NT
+        with pytest.raises(ValueError):
+            list(ex.stream("temp", chunk_size=0))
+
+
+def test_depths_follow_sigma_levels(roms):
+    j, i = sea_points(30)
+    lon, lat = grid_position(j, i)
+    with open_dataset(roms) as ds:
+        ex = PointExtractor(ds, lon, lat)
+        levels = ex.extract("temp").values
+        surface = ex.extract("temp", depths=[0.0]).values
+        deep = ex.extract("temp", depths=[1e4]).values
+    np.testing.assert_array_equal(surface[:, 0], levels[:, -1])
+    assert np.isnan(deep).all()
+
+
+def test_workers_match_serial(roms):
+    j, i = sea_points(101)
+    lon, lat = grid_position(j, i)
+    with open_dataset(roms) as ds:
+        ex = PointExtractor(ds, lon, lat)
+        serial = ex.extract("temp", depths=[1.0, 30.0]).values
+        threaded = ex.extract("temp", depths=[1.0, 30.0], workers=4).values
+    np.testing.assert_array_equal(serial, threaded)
+
+
+def test_grid_cache_written_and_reused(roms, isolated_cache, monkeypatch):
+    lon, lat = grid_position(*sea_points(10))
+    with open_dataset(roms) as ds:
+        first = PointExtractor(ds, lon, lat).extract("temp").values
+        lon_rho, lat_rho = ds["lon_rho"].read(), ds["lat_rho"].read()
+    key = GridLocator.digest(lon_rho, lat_rho)
+    assert os.listdir(isolated_cache) == [f"grid-{key}.pickle"]
+
+    # A new process has an empty in-memory cache; it must load the pickle
+    # rather than build a tree.
+    monkeypatch.setattr(extract, "_locators", {})
+
+    def no_build(*args, **kwargs):
+        raise AssertionError("tree was rebuilt")
+
+    monkeypatch.setattr(extract, "_build_tree", no_build)
+    with open_dataset(roms) as ds:
+        second = PointExtractor(ds, lon, lat).extract("temp").values
+    np.testing.assert_array_equal(first, second)
+    assert GridLocator.cached(lon_rho, lat_rho) is GridLocator.cached(lon_rho, lat_rho)
+
+
+@pytest.mark.parametrize(
+    "payload",
+    [
+        pickle.dumps({"not": "a tree"}),
+        # Pickles of a class whose module, or the class itself, is gone.
+        b"\x80\x02cno_such_module\nTree\n)\x81.",
+        b"\x80\x02cscipy.spatial\nNoSuchTree\n)\x81.",
+        b"truncated",
+    ],
+)
+def test_bad_grid_cache_is_rebuilt(roms, isolated_cache, payload):
+    lon, lat = grid_position(*sea_points(10))
+    with open_dataset(roms) as ds:
+        lon_rho, lat_rho = ds["lon_rho"].read(), ds["lat_rho"].read()
+        path = isolated_cache / f"grid-{GridLocator.digest(lon_rho, lat_rho)}.pickle"
+        isolated_cache.mkdir()
+        path.write_bytes(payload)
+        values = PointExtractor(ds, lon, lat).extract("temp").values
+    np.testing.assert_allclose(values, expected_temp(*sea_points(10)), atol=ATOL)
+    with open(path, "rb") as fh:
+        tree = pickle.load(fh)
+    assert tree.n == NY * NX
+
+
+def test_grid_cache_of_another_grid_is_rebuilt(roms, isolated_cache):
+    with open_dataset(roms) as ds:
+        lon_rho, lat_rho = ds["lon_rho"].read(), ds["lat_rho"].read()
+    small = GridLocator(lon_rho[:5, :5], lat_rho[:5, :5])
+    isolated_cache.mkdir()
+    path = isolated_cache / f"grid-{GridLocator.digest(lon_rho, lat_rho)}.pickle"
+    path.write_bytes(pickle.dumps(small.tree))
+    assert GridLocator.cached(lon_rho, lat_rho).tree.n == NY * NX
+    with open(path, "rb") as fh:
+        assert pickle.load(fh).n == NY * NX
+
+
+def test_memory_only_cache(roms, isolated_cache):
+    lon, lat = grid_position(*sea_points(10))
+    with open_dataset(roms) as ds:
+        PointExtractor(ds, lon, lat, cache_dir="").extract("zeta")
+    assert not isolated_cache.exists()
+
+
+def test_section_points():
+    lon, lat = section_points([5.0, 5.0, 5.1], [60.0, 60.1, 60.1], spacing=1000.0)
+    assert (lon[0], lat[0]) == (5.0, 60.0)
+    assert (lon[-1], lat[-1]) == (5.1, 60.1)
+    # 0.1 degree of latitude is about 11.1 km; of longitude at 60N about 5.6 km.
+    assert len(lon) == 1 + 12 + 6
+    with pytest.raises(ValueError):
+        section_points([5.0], [60.0], spacing=1000.0)
+
+
+def test_depths_need_vtransform(roms):
+    import netCDF4
+
+    with netCDF4.Dataset(roms, "a") as ds:
+        ds.renameVariable("Vtransform", "vtransform_unused")
+    lon, lat = grid_position(*sea_points(5))
+    with open_dataset(roms) as ds:
+        ex = PointExtractor(ds, lon, lat)
+        with pytest.raises(KeyError, match="Vtransform"):
+            list(ex.stream("temp", depths=[5.0]))
+        assert ex.extract("temp").values.shape == (NT, NZ, 5)
@@ -0,0 +1,120 @@
+import numpy as np
+import pytest
+
+from norkyst import _interp
+from norkyst._interp import HAVE_EXTENSION, bilinear, sigma_z, vertical
+
+needs_extension = pytest.mark.skipif(not HAVE_EXTENSION, reason="norkyst_ext is not installed")
+
+
+def bilinear_case(dtype, seed=0):
+    rng = np.random.default_rng(seed)
+    lead, ny, nx, n = 3, 20, 30, 257
+    field = rng.normal(size=(2, lead, ny, nx)).astype(dtype)
+    field[..., 4:9, 6:12] = np.nan
+    j = rng.integers(0, ny - 1, n)
+    i = rng.integers(0, nx - 1, n)
+    weights = rng.uniform(0, 1, (n, 4))
+    weights /= weights.sum(axis=1, keepdims=True)
+    weights[::5, 1] = 0.0
+    weights[::11] = 0.0
+    return field, j, i, weights
+
+
+def vertical_case(seed=0):
+    rng = np.random.default_rng(seed)
+    lead, nz, n = 4, 6, 211
+    s = (np.arange(nz) - nz + 0.5) / nz
+    h = rng.uniform(5, 300, n)
+    zeta = rng.normal(0, 0.5, (lead, n))
+    zeta[:, ::13] = np.nan
+    z = sigma_z(h, zeta, s, -(s**2), 10.0, 2)
+    values = rng.normal(size=z.shape)
+    values[:, 2, ::7] = np.nan
+    depths = np.array([0.0, 0.5, 3.0, 12.0, 50.0, 120.0, 299.0, 500.0])
+    return values, z, depths
+
+
+@needs_extension
+@pytest.mark.parametrize("dtype", [np.float32, np.float64])
+@pytest.mark.parametrize("workers", [None, 4])
+def test_bilinear_extension_matches_numpy(dtype, workers):
+    field, j, i, weights = bilinear_case(dtype)
+    expected = bilinear(field, j, i, weights, backend="numpy")
+    actual = bilinear(field, j, i, weights, workers=workers, backend="ext")
+    assert actual.dtype == expected.dtype == dtype
+    assert np.array_equal(actual, expected, equal_nan=True)
+
+
+@needs_extension
+@pytest.mark.parametrize("workers", [None, 3])
+def test_vertical_extension_matches_numpy(workers):
+    values, z, depths = vertical_case()
+    expected = vertical(values, z, depths, backend="numpy")
+    actual = vertical(values, z, depths, workers=workers, backend="ext")
+    assert np.array_equal(actual, expected, equal_nan=True)
+
+
+@pytest.mark.skipif(HAVE_EXTENSION, reason="norkyst_ext is installed")
+def test_missing_extension():
+    field, j, i, weights = bilinear_case(np.float64)
+    with pytest.raises(ImportError):
+        bilinear(field, j, i, weights, backend="ext")
+
+
+def test_unknown_backend():
+    field, j, i, weights = bilinear_case(np.float64)
+    with pytest.raises(ValueError, match="unknown backend"):
+        bilinear(field, j, i, weights, backend="fortran")
+
+
+@pytest.mark.parametrize("dtype", [np.float32, np.float64])
+def test_bilinear_workers_match_serial(dtype):
+    field, j, i, weights = bilinear_case(dtype)
+    serial = bilinear(field, j, i, weights)
+    assert serial.shape == (2, 3, len(j))
+    assert np.array_equal(bilinear(field, j, i, weights, workers=5), serial, equal_nan=True)
+
+
+def test_bilinear_nan_corners_and_zero_weights():
+    field = np.arange(12, dtype=np.float64).reshape(3, 4)
+    field[0, 0] = np.nan
+    weights = np.array([[0.4, 0.3, 0.2, 0.1], [1.0, 0.0, 0.0, 0.0], [0.0, 0.0, 0.0, 0.0]])
+    out = bilinear(field, np.zeros(3, int), np.zeros(3, int), weights)
+    assert out[0] == pytest.approx((0.3 * 1 + 0.2 * 4 + 0.1 * 5) / 0.6)
+    assert np.isnan(out[1:]).all()
+
+
+def test_vertical_workers_match_serial():
+    values, z, depths = vertical_case()
+    serial = vertical(values, z, depths)
+    assert serial.shape == (4, len(depths), values.shape[-1])
+    assert np.array_equal(vertical(values, z, depths, workers=4), serial, equal_nan=True)
+
+
+def test_vertical_column():
+    values = np.array([[3.0], [1.0], [0.0]])
+    z = np.array([[-30.0], [-10.0], [-2.0]])
+    out = vertical(values, z, [0.0, 2.0, 6.0, 20.0, 30.0, 31.0], backend="numpy")
+    np.testing.assert_array_equal(out[:5, 0], [0.0, 0.0, 0.5, 2.0, 3.0])
+    assert np.isnan(out[5, 0])
+
+
+def test_sigma_z_hand_computed():
+    h = np.array([100.0, 50.0])
+    zeta = np.array([1.0, 1.0])
+    s = np.array([-1.0, -0.5, 0.0])
+    c = np.array([-1.0, -0.25, 0.0])
+    # Vtransform 1: z0 = hc s + (h - hc) C,  z = z0 + zeta (1 + z0 / h)
+    z1 = sigma_z(h, zeta, s, c, 10.0, vtransform=1)
+    np.testing.assert_allclose(z1, [[-100.0, -50.0], [-26.775, -14.3], [1.0, 1.0]])
+    # Vtransform 2: z0 = (hc s + h C) / (hc + h),  z = zeta + (zeta + h) z0
+    z2 = sigma_z(h, zeta, s, c, 10.0, vtransform=2)
+    np.testing.assert_allclose(z2, [[-100.0, -50.0], [-292.0 / 11.0, -13.875], [1.0, 1.0]])
+    assert sigma_z(h, zeta[None], s, c, 10.0).shape == (1, 3, 2)
+    with pytest.raises(ValueError, match="Vtransform"):
+        sigma_z(h, zeta, s, c, 10.0, vtransform=3)
+
+
+def test_extension_flag():
+    assert HAVE_EXTENSION == (_interp._ext is not None)
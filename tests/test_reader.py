@@ -0,0 +1,188 @@
+import numpy as np
+import pytest
+
+import norkyst
+from norkyst.reader import Variable, decode_time, open_dataset
+
+FORMATS = ["NETCDF4", "NETCDF3_64BIT_OFFSET"]
+
+
+def write_sample(path, format):
+    import netCDF4
+
+    with netCDF4.Dataset(path, "w", format=format) as ds:
+        ds.title = "sample"
+        ds.createDimension("time", None)
+        ds.createDimension("y", 3)
+        ds.createDimension("x", 4)
+        time = ds.createVariable("time", "f8", ("time",))
+        time.units = "hours since 2024-01-01T00:00:00Z"
+        time[:] = [0.0, 1.5, 24.0]
+
+        packed = ds.createVariable("packed", "i2", ("time", "y", "x"), fill_value=np.int16(-32767))
+        packed.scale_factor = np.float32(0.5)
+        packed.add_offset = np.float32(10.0)
+        counts = ds.createVariable("counts", "i4", ("y", "x"))
+        counts.missing_value = np.int32(-1)
+        plain = ds.createVariable("plain", "i4", ("y", "x"))
+        nanfill = ds.createVariable("nanfill", "f4", ("y", "x"), fill_value=np.float32(np.nan))
+        ds.set_auto_maskandscale(False)
+
+        raw = np.arange(36, dtype=np.int16).reshape(3, 3, 4)
+        raw[1, 2, 3] = -32767
+        packed[:] = raw
+        c = np.arange(12, dtype=np.int32).reshape(3, 4)
+        c[0, 0] = -1
+        counts[:] = c
+        plain[:] = np.arange(12, dtype=np.int32).reshape(3, 4)
+        f = np.ones((3, 4), dtype=np.float32)
+        f[2, 1] = np.nan
+        nanfill[:] = f
+    return str(path)
+
+
+@pytest.fixture(params=FORMATS)
+def sample(request, tmp_path):
+    return write_sample(tmp_path / f"{request.param}.nc", request.param)
+
+
+def test_backend_choice(tmp_path):
+    with open_dataset(write_sample(tmp_path / "a.nc", "NETCDF4")) as ds:
+        assert ds.backend == "netcdf4"
+    classic = write_sample(tmp_path / "b.nc", "NETCDF3_64BIT_OFFSET")
+    with open_dataset(classic) as ds:
+        assert ds.backend == "scipy"
+    with open_dataset(classic, backend="netcdf4") as ds:
+        assert ds.backend == "netcdf4"
+
+
+def test_backend_errors(tmp_path):
+    hdf5 = write_sample(tmp_path / "a.nc", "NETCDF4")
+    with pytest.raises(ValueError, match="only reads NetCDF-3"):
+        open_dataset(hdf5, backend="scipy")
+    with pytest.raises(ValueError, match="unknown backend"):
+        open_dataset(hdf5, backend="h5py")
+    text = tmp_path / "not.nc"
+    text.write_text("hello world")
+    with pytest.raises(ValueError, match="not a NetCDF file"):
+        open_dataset(text)
+
+
+def test_open_reads_no_data(sample, monkeypatch):
+    def fail(self, key):
+        raise AssertionError(f"{self.name} was read")
+
+    monkeypatch.setattr(Variable, "__getitem__", fail)
+    with open_dataset(sample) as ds:
+        assert ds.dimensions == {"time": 3, "y": 3, "x": 4}
+        assert ds.attrs["title"] == "sample"
+        assert set(ds) == {"time", "packed", "counts", "plain", "nanfill"}
+        assert ds["packed"].shape == (3, 3, 4)
+        assert ds._time is None
+        if ds.backend == "scipy":
+            # Memory-mapped: the raw arrays are views, not copies.
+            assert all(not var._raw.flags.owndata for var in ds.values())
+
+
+def test_scale_offset_and_fill(sample):
+    with open_dataset(sample) as ds:
+        var = ds["packed"]
+        assert var.dtype == np.float32
+        values = var[1]
+        assert values.dtype == np.float32
+        expected = np.arange(12, 24, dtype=np.float32).reshape(3, 4) * 0.5 + 10.0
+        expected[2, 3] = np.nan
+        np.testing.assert_array_equal(values, expected)
+
+
+def test_missing_value_promotes_integers(sample):
+    with open_dataset(sample) as ds:
+        counts = ds["counts"]
+        assert counts.dtype == np.float64
+        values = counts[:]
+        assert np.isnan(values[0, 0])
+        np.testing.assert_array_equal(values.ravel()[1:], np.arange(1, 12))
+
+        plain = ds["plain"].read()
+        assert plain.dtype == np.int32
+        np.testing.assert_array_equal(plain, np.arange(12).reshape(3, 4))
+
+
+def test_nan_fill_value(sample):
+    with open_dataset(sample) as ds:
+        values = ds["nanfill"][:]
+        assert np.isnan(values[2, 1])
+        assert np.nansum(values) == 11
+
+
+def test_data_survives_close(sample):
+    ds = open_dataset(sample)
+    values = ds["plain"][:]
+    ds.close()
+    np.testing.assert_array_equal(values, np.arange(12).reshape(3, 4))
+
+
+def test_backends_agree(tmp_path):
+    path = write_sample(tmp_path / "c.nc", "NETCDF3_64BIT_OFFSET")
+    with open_dataset(path, backend="scipy") as a, open_dataset(path, backend="netcdf4") as b:
+        for name in a:
+            assert a[name].dtype == b[name].dtype
+            np.testing.assert_array_equal(a[name][...], b[name][...])
+        np.testing.assert_array_equal(a.time, b.time)
+
+
+def test_time(sample):
+    with open_dataset(sample) as ds:
+        expected = np.array(
+            ["2024-01-01T00:00:00", "2024-01-01T01:30:00", "2024-01-02T00:00:00"],
+            dtype="datetime64[s]",
+        )
+        np.testing.assert_array_equal(ds.time, expected)
+
+
+class FakeTime:
+    def __init__(self, values, **attrs):
+        self.attrs = attrs
+        self._values = np.asarray(values, dtype=np.float64)
+
+    def __getitem__(self, key):
+        return self._values[key]
+
+
+@pytest.mark.parametrize(
+    "units, expected",
+    [
+        ("days since 2000-01-01", "2000-01-03T00:00:00"),
+        ("seconds since 1970-01-01 00:00:00", "1970-01-01T00:00:02"),
+        ("minutes since 2020-06-01T12:00:00Z", "2020-06-01T12:02:00"),
+        ("hours since 2024-01-01 00:00:00+00:00", "2024-01-01T02:00:00"),
+        ("days since 1970-1-1", "1970-01-03T00:00:00"),
+        ("seconds since 1970-01-01 00:00:00 UTC", "1970-01-01T00:00:02"),
+        ("hours since 2024-01-01T00:00:00-01:00", "2024-01-01T03:00:00"),
+        ("hours since 2024-01-01 00:00 +02:00", "2024-01-01T00:00:00"),
+    ],
+)
+def test_decode_time_units(units, expected):
+    decoded = decode_time(FakeTime([2], units=units))
+    assert decoded[0] == np.datetime64(expected, "s")
+
+
+def test_decode_time_rounds_and_masks():
+    decoded = decode_time(FakeTime([0.4, 1.6, -0.4, np.nan], units="seconds since 2000-01-01"))
+    assert decoded.dtype == np.dtype("datetime64[s]")
+    expected = ["2000-01-01T00:00:00", "2000-01-01T00:00:02", "2000-01-01T00:00:00"]
+    np.testing.assert_array_equal(decoded[:3], np.array(expected, dtype="datetime64[s]"))
+    assert np.isnat(decoded[3])
+
+
+def test_decode_time_errors():
+    with pytest.raises(ValueError, match="cannot decode"):
+        decode_time(FakeTime([0], units="fortnights since 2000-01-01"))
+    with pytest.raises(ValueError, match="cannot decode"):
+        decode_time(FakeTime([0], units="days"))
+    with pytest.raises(ValueError, match="unsupported calendar"):
+        decode_time(FakeTime([0], units="days since 2000-01-01", calendar="noleap"))
+
+
+def test_exports():
+    assert norkyst.open_dataset is open_dataset
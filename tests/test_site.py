@@ -0,0 +1,196 @@
+import json
+import os
+import struct
+import zlib
+
+import numpy as np
+import pytest
+
+from norkyst.site import PALETTE, build_site, downsample, main, quantize
+from norkyst.testing import write_synthetic_roms
+
+NY, NX, NT = 40, 60, 5
+TILE = 5
+
+
+def read_png(path):
+    """Decode the indexed PNGs written by norkyst.site, checking each chunk."""
+    with open(path, "rb") as fh:
+        data = fh.read()
+    assert data[:8] == b"\x89PNG\r\n\x1a\n"
+    pos, chunks = 8, {}
+    while pos < len(data):
+        (length,) = struct.unpack(">I", data[pos : pos + 4])
+        kind = data[pos + 4 : pos + 8]
+        body = data[pos + 8 : pos + 8 + length]
+        (crc,) = struct.unpack(">I", data[pos + 8 + length : pos + 12 + length])
+        assert crc == zlib.crc32(kind + body) & 0xFFFFFFFF
+        chunks[kind] = body
+        pos += 12 + length
+    width, height, depth, colour = struct.unpack(">IIBB", chunks[b"IHDR"][:10])
+    assert (depth, colour) == (8, 3)
+    rows = np.frombuffer(zlib.decompress(chunks[b"IDAT"]), dtype=np.uint8)
+    rows = rows.reshape(height, width + 1)
+    assert not rows[:, 0].any()
+    palette = np.frombuffer(chunks[b"PLTE"], dtype=np.uint8).reshape(-1, 3)
+    alpha = np.frombuffer(chunks[b"tRNS"], dtype=np.uint8)
+    return rows[:, 1:], palette, alpha
+
+
+@pytest.fixture
+def roms(tmp_path):
+    return write_synthetic_roms(tmp_path / "roms.nc", ny=NY, nx=NX, nt=NT)
+
+
+def test_index_layout(roms, tmp_path):
+    out = tmp_path / "site"
+    index = build_site([roms], out, ["temp", "zeta"], tile_size=TILE)
+    with open(out / "index.json") as fh:
+        assert json.load(fh) == index
+    assert index["version"] == 3
+    assert index["tile_size"] == TILE
+    assert index["times"][0] == "2024-01-01T00:00:00Z"
+    assert len(index["times"]) == NT
+    assert set(index["variables"]) == {"temp", "zeta"}
+    temp = index["variables"]["temp"]
+    assert temp["units"] == "Celsius"
+    # Surface temp over all steps: lowest at t = 0 in the (0, 0) corner,
+    # highest at the last step in the opposite corner.
+    assert temp["vmin"] == pytest.approx(5.0 - 0.5 * 3, abs=2e-3)
+    assert temp["vmax"] == pytest.approx(3.5 + 0.01 * 59 + 0.02 * 39 + 0.1 * 4, abs=2e-3)
+    assert index["variables"]["zeta"]["units"] == "meter"
+    grid = index["grid"]
+    assert grid["shape"] == [NY, NX]
+    assert len(grid["bbox"]) == 4
+    assert [z["shape"] for z in grid["zooms"]] == [[3, 4], [5, 8], [10, 15], [20, 30], [40, 60]]
+    assert [z["factor"] for z in grid["zooms"]] == [16, 8, 4, 2, 1]
+
+    with open(out / "temp" / "0" / "index.json") as fh:
+        step = json.load(fh)
+    assert set(step) == {"tiles"}
+    assert len(step["tiles"]) == len(grid["zooms"])
+
+
+def test_tiles(roms, tmp_path):
+    out = tmp_path / "site"
+    index = build_site([roms], out, ["temp"], tile_size=TILE)
+    with open(out / "temp" / "0" / "index.json") as fh:
+        step = json.load(fh)
+    # The island (eta 10..19, xi 15..29) empties six full-resolution tiles
+    # and one at the next level down.
+    assert [len(t) for t in step["tiles"]] == [1, 2, 6, 23, 90]
+    assert [2, 3] not in step["tiles"][-1]
+    assert [1, 2] not in step["tiles"][-2]
+
+    for zoom, (present, level) in enumerate(zip(step["tiles"], index["grid"]["zooms"])):
+        names = sorted(os.listdir(out / "temp" / "0" / str(zoom)))
+        assert names == sorted(f"{ty}_{tx}.png" for ty, tx in present)
+        for ty, tx in present:
+            q, palette, alpha = read_png(out / "temp" / "0" / str(zoom) / f"{ty}_{tx}.png")
+            # Edge tiles are cut to the level's shape.
+            rows = min(TILE, level["shape"][0] - ty * TILE)
+            cols = min(TILE, level["shape"][1] - tx * TILE)
+            assert q.shape == (rows, cols)
+            np.testing.assert_array_equal(palette, PALETTE)
+            assert alpha[0] == 0 and (alpha[1:] == 255).all()
+
+    # The coarsest level holds 3 x 4 cells in a single small tile.
+    q, _, _ = read_png(out / "temp" / "0" / "0" / "0_0.png")
+    assert q.shape == (3, 4)
+
+
+def test_tile_contents_round_trip(roms, tmp_path):
+    out = tmp_path / "site"
+    index = build_site([roms], out, ["temp"], tile_size=TILE)
+    vmin, vmax = index["variables"]["temp"]["vmin"], index["variables"]["temp"]["vmax"]
+    # Tile (1, 1) at full resolution covers eta 5..9, xi 5..9; north-up.
+    q, _, _ = read_png(out / "temp" / "2" / "4" / "1_1.png")
+    decoded = vmin + (q[::-1].astype(float) - 1) / 254 * (vmax - vmin)
+    jj, ii = np.meshgrid(np.arange(5, 10), np.arange(5, 10), indexing="ij")
+    expected = 5.0 + 0.01 * ii + 0.02 * jj + 0.1 * 2 - 0.5 * 3
+    np.testing.assert_allclose(decoded, expected, atol=(vmax - vmin) / 254 / 2 + 2e-3)
+
+
+def test_colour_range_is_shared_by_steps(roms, tmp_path):
+    out = tmp_path / "site"
+    build_site([roms], out, ["temp"], tile_size=TILE)
+    # temp rises by 0.1 per step everywhere, so every index in a tile moves
+    # by about 0.1 / step with the range fixed over time.
+    first, _, _ = read_png(out / "temp" / "0" / "4" / "1_1.png")
+    last, _, _ = read_png(out / "temp" / str(NT - 1) / "4" / "1_1.png")
+    step = (5.27 - 3.5) / 254
+    shift = last.astype(int) - first.astype(int)
+    assert np.abs(shift - 0.1 * (NT - 1) / step).max() <= 1
+
+
+def test_fixed_ranges(roms, tmp_path):
+    out = tmp_path / "site"
+    index = build_site([roms], out, ["temp", "zeta"], tile_size=TILE, ranges={"temp": (4.0, 5.0)})
+    assert (index["variables"]["temp"]["vmin"], index["variables"]["temp"]["vmax"]) == (4.0, 5.0)
+    assert index["variables"]["zeta"]["vmin"] == pytest.approx(-0.039, abs=1e-6)
+    # Values outside the range are clipped, not dropped.
+    q, _, _ = read_png(out / "temp" / "0" / "4" / "0_0.png")
+    assert q.min() == 1
+    q, _, _ = read_png(out / "temp" / str(NT - 1) / "4" / "7_11.png")
+    assert q.max() == 255
+    with pytest.raises(ValueError, match="empty range"):
+        build_site([roms], out, ["temp"], ranges={"temp": (5.0, 4.0)})
+
+
+def test_png_decodes_with_pillow(roms, tmp_path):
+    Image = pytest.importorskip("PIL.Image")
+    out = tmp_path / "site"
+    build_site([roms], out, ["zeta"], tile_size=TILE)
+    path = out / "zeta" / "0" / "1" / "0_1.png"
+    expected, _, _ = read_png(path)
+    with Image.open(path) as image:
+        assert image.mode == "P"
+        np.testing.assert_array_equal(np.asarray(image), expected)
+
+
+def test_time_stride_spans_files(tmp_path):
+    paths = [
+        write_synthetic_roms(tmp_path / f"{k}.nc", ny=8, nx=10, nt=NT, land=False)
+        for k in range(3)
+    ]
+    index = build_site(paths, tmp_path / "site", ["zeta"], tile_size=8, time_stride=3)
+    # 15 hourly steps over three files; every third hour overall.
+    assert index["times"] == [f"2024-01-01T{h:02d}:00:00Z" for h in (0, 3, 1, 4, 2)]
+    assert sorted(os.listdir(tmp_path / "site" / "zeta")) == ["0", "1", "2", "3", "4"]
+
+
+def test_main(roms, tmp_path, capsys):
+    out = tmp_path / "cli"
+    argv = ["-v", "zeta", "-o", str(out), "--tile-size", "16", "--time-stride", "2"]
+    assert main(argv + ["--range", "zeta", "-1", "1", roms]) == 0
+    with open(out / "index.json") as fh:
+        index = json.load(fh)
+    assert len(index["times"]) == 3
+    assert (index["variables"]["zeta"]["vmin"], index["variables"]["zeta"]["vmax"]) == (-1.0, 1.0)
+    assert "wrote 3 time steps" in capsys.readouterr().err
+
+
+def test_quantize_round_trip():
+    rng = np.random.default_rng(0)
+    field = rng.normal(10, 5, (50, 70))
+    field[::7, ::3] = np.nan
+    vmin, vmax = np.nanmin(field), np.nanmax(field)
+    q = quantize(field, vmin, vmax)
+    assert q.dtype == np.uint8
+    assert (q[np.isnan(field)] == 0).all()
+    assert (q[~np.isnan(field)] >= 1).all()
+    decoded = vmin + (q.astype(float) - 1) / 254 * (vmax - vmin)
+    err = np.abs(decoded - field)[~np.isnan(field)]
+    assert err.max() <= (vmax - vmin) / 254
+    assert quantize(np.array([vmin, vmax]), vmin, vmax).tolist() == [1, 255]
+    assert quantize(np.array([3.0]), 3.0, 3.0).tolist() == [1]
+
+
+def test_downsample():
+    field = np.arange(15, dtype=float).reshape(3, 5)
+    field[0, 0] = np.nan
+    out = downsample(field)
+    assert out.shape == (2, 3)
+    assert out[0, 0] == pytest.approx((1 + 5 + 6) / 3)
+    assert out[1, 2] == 14.0
+    assert np.isnan(downsample(np.full((2, 2), np.nan))).all()